@@ -0,0 +1,123 @@
+import time
+import queue
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# COLA DE ALERTAS DE TELEGRAM EN SEGUNDO PLANO
+# ============================================================
+# Las alertas se encolan (put no bloquea nunca) y un hilo las envía con una
+# sesión HTTP reutilizada. Los mensajes consecutivos dirigidos a los chats de
+# log se agrupan en un solo sendMessage. close() vacía la cola con un plazo
+# máximo, de modo que las alertas nunca quedan en el camino crítico de la orden.
+
+TELEGRAM_MAX_CHARS = 4096
+_STOP = object()
+
+
+class AlertQueue:
+    """ Envío asíncrono de alertas a Telegram con cola acotada y batching. """
+
+    def __init__(self, token, api_url="https://api.telegram.org", batch_chat_ids=(),
+                 maxsize=100, linger_seconds=0.5, timeout=10):
+        self.token = token
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.batch_chat_ids = {str(c) for c in batch_chat_ids if c}
+        self.linger_seconds = linger_seconds
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.sent = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="telegram-alerts", daemon=True)
+        self._thread.start()
+
+    def put(self, chat_id, text):
+        """ Encola una alerta. Si la cola está llena se descarta y retorna False. """
+        try:
+            self.queue.put_nowait((str(chat_id), text))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Cola de alertas llena ({self.queue.maxsize}). Alerta descartada.")
+            return False
+
+    def close(self, deadline_seconds=5.0):
+        """ Envía lo pendiente y detiene el hilo, esperando como máximo el plazo dado. """
+        try:
+            self.queue.put(_STOP, timeout=deadline_seconds)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=deadline_seconds)
+        if self._thread.is_alive():
+            logger.warning(f"Plazo de vaciado agotado: {self.queue.qsize()} alertas sin enviar.")
+        self.session.close()
+
+    # --------------------------------------------------------
+    # Hilo de envío
+    # --------------------------------------------------------
+    def _drain(self, first):
+        """ Toma el primer ítem y todo lo ya encolado (esperando linger si es log). """
+        items = [first]
+        if first[0] in self.batch_chat_ids and self.linger_seconds > 0:
+            deadline = time.monotonic() + self.linger_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                items.append(item)
+                if item is _STOP:
+                    return items
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return items
+            items.append(item)
+            if item is _STOP:
+                return items
+
+    def _batches(self, items):
+        """ Agrupa mensajes consecutivos al mismo chat de log respetando el orden. """
+        batches = []
+        for chat_id, text in items:
+            last = batches[-1] if batches else None
+            if (last and last[0] == chat_id and chat_id in self.batch_chat_ids
+                    and len(last[1]) + len(text) + 2 <= TELEGRAM_MAX_CHARS):
+                batches[-1] = (chat_id, f"{last[1]}\n\n{text}")
+            else:
+                batches.append((chat_id, text))
+        return batches
+
+    def _send(self, chat_id, text):
+        try:
+            payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
+            resp = self.session.post(self.url, data=payload, timeout=self.timeout)
+            if resp.status_code != 200:
+                logger.warning(f"Fallo enviando alerta a Telegram a {chat_id}: {resp.text}")
+            else:
+                self.sent += 1
+        except Exception as e:
+            logger.warning(f"Excepción al enviar alerta a Telegram: {e}")
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is _STOP:
+                return
+            items = self._drain(first)
+            stop = items[-1] is _STOP
+            if stop:
+                items.pop()
+            for chat_id, text in self._batches(items):
+                self._send(chat_id, text)
+            if stop:
+                return
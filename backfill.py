@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# BACKFILL MASIVO DE VELAS OHLCV (HISTÓRICO PARA RESEARCH / WARM-UP)
+# ============================================================
+# Divide [start, end) en tramos de `chunk_candles` velas y los descarga en
+# paralelo (un exchange ccxt por hilo) paginando fetch_ohlcv(since=...). Todas
+# las peticiones pasan por un limitador común, así que la concurrencia no
+# multiplica el ritmo frente al exchange; los errores de red / rate limit se
+# reintentan con backoff exponencial.
+#
+# Cada tramo descargado se guarda como parts/<inicio_ms>.npy (escritura atómica)
+# y sólo si la paginación llegó hasta su final se marca con parts/<inicio_ms>.done.
+# Al relanzar el comando se descargan los tramos sin marca: los que faltan, los
+# que quedaron incompletos por una página vacía transitoria y el último, que se
+# corta en "ahora" y sigue abierto hasta que se cubra entero. Un tramo cuya
+# primera página empieza después de su inicio (el exchange no sirve ese rango)
+# tampoco se marca y aparece en unserved_chunks del manifest.
+# Al final se fusionan en ohlcv.npy (float64, columnas Timestamp/Open/High/Low/
+# Close/Volume, ordenado y sin duplicados) y manifest.json con el rango, los
+# duplicados descartados y los huecos detectados. El live path lo carga con
+# load_backfill() (np.load con mmap, sin parsear nada).
+#
+# Nota: el endpoint OHLC de Kraken sólo devuelve las últimas 720 velas de cada
+# timeframe, así que para históricos largos conviene --exchange con un exchange
+# que pagine hacia atrás (ej: binance, bitstamp); el resultado se usa igual.
+
+COLUMNS = ("Timestamp", "Open", "High", "Low", "Close", "Volume")
+DEFAULT_DIR = "backfill"
+MAX_GAPS_IN_MANIFEST = 100
+
+
+def dataset_dir(out_dir, exchange_id, symbol, timeframe):
+    return os.path.join(out_dir, f"{exchange_id}_{symbol.replace('/', '-')}_{timeframe}")
+
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+
+
+def _to_ms(value):
+    """ '2024-01-01' / '2024-01-01T12:00' (UTC) o epoch en ms -> ms. """
+    if isinstance(value, (int, float)):
+        return int(value)
+    if value.isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+class RateLimiter:
+    """ Espaciado mínimo entre peticiones, compartido por todos los hilos. """
+
+    def __init__(self, interval_seconds):
+        self.interval = interval_seconds
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def penalize(self, seconds):
+        """ Tras un rate limit del exchange, retrasa a todos los hilos. """
+        with self.lock:
+            self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+
+class Backfill:
+    """ Descarga concurrente y reanudable de un rango de velas a NPY. """
+
+    def __init__(self, exchange_factory, symbol, timeframe, out_dir=DEFAULT_DIR,
+                 workers=4, chunk_candles=1000, page_limit=720, max_retries=5,
+                 rate_limit_seconds=None):
+        import ccxt
+
+        self.exchange_factory = exchange_factory
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.workers = max(1, workers)
+        self.page_limit = page_limit
+        self.max_retries = max_retries
+        self.tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.chunk_ms = chunk_candles * self.tf_ms
+        self.retryable = (ccxt.NetworkError, ccxt.ExchangeNotAvailable)
+
+        probe = exchange_factory()
+        self.exchange_id = probe.id
+        # ccxt expresa rateLimit en ms entre peticiones de una instancia; como
+        # hay una instancia por hilo, el limitador común aplica ese ritmo global.
+        interval = rate_limit_seconds if rate_limit_seconds is not None else probe.rateLimit / 1000
+        self.limiter = RateLimiter(interval)
+        self.local = threading.local()
+
+        self.directory = dataset_dir(out_dir, self.exchange_id, symbol, timeframe)
+        self.parts_dir = os.path.join(self.directory, "parts")
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.stats = {"requests": 0, "retries": 0, "chunks_downloaded": 0, "chunks_skipped": 0}
+        self.stats_lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # Descarga
+    # --------------------------------------------------------
+    def _exchange(self):
+        if getattr(self.local, "exchange", None) is None:
+            ex = self.exchange_factory()
+            ex.enableRateLimit = False # El ritmo lo pone self.limiter
+            self.local.exchange = ex
+        return self.local.exchange
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _fetch_page(self, since):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            self._count("requests")
+            try:
+                return self._exchange().fetch_ohlcv(self.symbol, timeframe=self.timeframe,
+                                                     since=since, limit=self.page_limit)
+            except self.retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                backoff = min(60.0, 2 ** attempt)
+                self.limiter.penalize(backoff)
+                self._count("retries")
+                logger.warning(f"Reintento {attempt + 1}/{self.max_retries} en since={_iso(since)} "
+                               f"tras {backoff:.0f}s: {e}")
+
+    def _part_path(self, chunk_start):
+        return os.path.join(self.parts_dir, f"{chunk_start}.npy")
+
+    def _done_path(self, chunk_start):
+        return os.path.join(self.parts_dir, f"{chunk_start}.done")
+
+    def _download_chunk(self, chunk_start, chunk_end):
+        """
+        Descarga un tramo. Retorna (velas, estado) con estado "complete",
+        "incomplete" o "unserved" (el exchange no sirve velas desde su inicio).
+        """
+        rows = []
+        cursor = chunk_start
+        unserved = False
+        while cursor < chunk_end:
+            page = self._fetch_page(cursor)
+            if not page:
+                break
+            rows.extend(c for c in page if chunk_start <= c[0] < chunk_end)
+            if page[0][0] > cursor + self.tf_ms:
+                # La página no continúa desde `cursor` (ej: Kraken ignora un since
+                # antiguo y devuelve sus últimas 720 velas): el tramo queda sin cubrir.
+                unserved = cursor == chunk_start
+                break
+            next_cursor = page[-1][0] + self.tf_ms
+            if next_cursor <= cursor:
+                break # El exchange no avanza (ej: sólo devuelve las últimas N velas)
+            cursor = next_cursor
+
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+        path = self._part_path(chunk_start)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, data)
+        os.replace(tmp_path, path)
+        self._count("chunks_downloaded")
+
+        # Completo = páginas contiguas desde el inicio hasta el final del tramo
+        # nominal (no recortado en "ahora").
+        if cursor >= chunk_end and chunk_end == chunk_start + self.chunk_ms:
+            status = "complete"
+        else:
+            status = "unserved" if unserved else "incomplete"
+        done_path = self._done_path(chunk_start)
+        if status == "complete":
+            open(done_path, "w").close()
+        elif os.path.exists(done_path):
+            os.remove(done_path)
+        return len(data), status
+
+    def run(self, start, end):
+        """ Descarga los tramos pendientes de [start, end) y fusiona. Retorna el manifest. """
+        start_ms = start // self.tf_ms * self.tf_ms
+        end_ms = min(end, int(time.time() * 1000) // self.tf_ms * self.tf_ms)
+        chunks = [(s, min(s + self.chunk_ms, end_ms)) for s in range(start_ms, end_ms, self.chunk_ms)]
+        pending = [c for c in chunks if not os.path.exists(self._done_path(c[0]))]
+        self.stats["chunks_skipped"] = len(chunks) - len(pending)
+        logger.info(f"Backfill {self.exchange_id} {self.symbol} {self.timeframe}: {len(chunks)} tramos, "
+                    f"{len(pending)} pendientes, {self.workers} hilos.")
+
+        failed, incomplete, unserved = [], [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._download_chunk, s, e): (s, e) for s, e in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                s, e = futures[future]
+                try:
+                    rows, status = future.result()
+                    note = ""
+                    if status == "incomplete":
+                        incomplete.append(s)
+                        note = " (incompleto, se repetirá)"
+                    elif status == "unserved":
+                        unserved.append(s)
+                        note = " (el exchange no sirve este rango)"
+                    logger.info(f"[{done}/{len(pending)}] {_iso(s)} -> {rows} velas{note}")
+                except Exception as exc:
+                    failed.append(s)
+                    logger.error(f"Tramo {_iso(s)} falló: {exc}")
+
+        manifest = self.merge(start_ms, end_ms)
+        manifest["failed_chunks"] = [_iso(s) for s in failed]
+        manifest["incomplete_chunks"] = [_iso(s) for s in incomplete]
+        manifest["unserved_chunks"] = [_iso(s) for s in unserved]
+        manifest["stats"] = dict(self.stats)
+        self._write_manifest(manifest)
+        return manifest
+
+    # --------------------------------------------------------
+    # Fusión y verificación
+    # --------------------------------------------------------
+    def merge(self, start_ms, end_ms):
+        """ Une las partes del rango en ohlcv.npy (ordenado, sin duplicados) y detecta huecos. """
+        parts = []
+        for name in os.listdir(self.parts_dir):
+            if name.endswith(".npy") and ".tmp" not in name and start_ms <= int(name[:-4]) < end_ms:
+                parts.append(np.load(os.path.join(self.parts_dir, name)))
+        data = np.concatenate(parts) if parts else np.empty((0, len(COLUMNS)))
+
+        # np.unique ordena por timestamp y se queda con la primera aparición.
+        _, first = np.unique(data[:, 0], return_index=True)
+        duplicates = len(data) - len(first)
+        data = data[first]
+
+        gaps = []
+        if len(data) > 1:
+            diffs = np.diff(data[:, 0])
+            for i in np.nonzero(diffs > self.tf_ms)[0]:
+                gaps.append({"from": _iso(data[i, 0] + self.tf_ms), "to": _iso(data[i + 1, 0]),
+                             "missing": int(diffs[i] // self.tf_ms) - 1})
+        missing = int(sum(g["missing"] for g in gaps))
+
+        out_path = os.path.join(self.directory, "ohlcv.npy")
+        tmp_path = f"{out_path}.tmp.npy"
+        np.save(tmp_path, data)
+        os.replace(tmp_path, out_path)
+
+        if duplicates or gaps:
+            logger.warning(f"Backfill con {duplicates} duplicados descartados y {len(gaps)} huecos "
+                           f"({missing} velas faltantes).")
+        return {
+            "exchange": self.exchange_id,
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "columns": list(COLUMNS),
+            "requested": {"start": _iso(start_ms), "end": _iso(end_ms)},
+            "rows": int(len(data)),
+            "first": _iso(data[0, 0]) if len(data) else None,
+            "last": _iso(data[-1, 0]) if len(data) else None,
+            "duplicates_dropped": int(duplicates),
+            "missing_candles": missing,
+            "gap_count": len(gaps),
+            "gaps": gaps[:MAX_GAPS_IN_MANIFEST],
+            "file": out_path,
+        }
+
+    def _write_manifest(self, manifest):
+        manifest["created"] = datetime.now(timezone.utc).isoformat()
+        path = os.path.join(self.directory, "manifest.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def load_backfill(path, timeframe=None, limit=None):
+    """
+    Velas de un backfill como lista fetch_ohlcv ([ts_ms, o, h, l, c, v], ts entero),
+    listas para IndicatorEngine.extend(). `path` es ohlcv.npy o su directorio.
+    Con `timeframe` se valida contra el manifest; `limit` toma sólo las últimas N.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, "ohlcv.npy")
+    manifest_path = os.path.join(os.path.dirname(path), "manifest.json")
+    if timeframe is not None and os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            stored = json.load(f).get("timeframe")
+        if stored != timeframe:
+            raise ValueError(f"El backfill {path} es de {stored}, no de {timeframe}.")
+
+    data = np.load(path, mmap_mode="r")
+    if limit:
+        data = data[-limit:]
+    klines = np.asarray(data).tolist()
+    for candle in klines:
+        candle[0] = int(candle[0])
+    return klines
+
+
+if __name__ == "__main__":
+    import argparse
+    import ccxt
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+
+    parser = argparse.ArgumentParser(description="Backfill concurrente y reanudable de velas OHLCV a NPY.")
+    parser.add_argument("--symbol", default=os.getenv("SYMBOL", "ADA/USD"))
+    parser.add_argument("--timeframe", default=os.getenv("TIMEFRAME", "1h"))
+    parser.add_argument("--start", required=True, help="Fecha ISO (UTC) o epoch en ms.")
+    parser.add_argument("--end", help="Fecha ISO (UTC) o epoch en ms (por defecto ahora).")
+    parser.add_argument("--exchange", default="kraken", help="Id de exchange ccxt.")
+    parser.add_argument("--out", default=DEFAULT_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-candles", type=int, default=1000)
+    parser.add_argument("--page-limit", type=int, default=720)
+    parser.add_argument("--rate-limit", type=float, help="Segundos mínimos entre peticiones (por defecto los de ccxt).")
+    args = parser.parse_args()
+
+    exchange_class = getattr(ccxt, args.exchange)
+    backfill = Backfill(lambda: exchange_class({"enableRateLimit": False}), args.symbol, args.timeframe,
+                        out_dir=args.out, workers=args.workers, chunk_candles=args.chunk_candles,
+                        page_limit=args.page_limit, rate_limit_seconds=args.rate_limit)
+    end = _to_ms(args.end) if args.end else int(time.time() * 1000)
+    result = backfill.run(_to_ms(args.start), end)
+    print(json.dumps({k: v for k, v in result.items() if k != "gaps"}, indent=2))
+    raise SystemExit(1 if result["failed_chunks"] else 0)
@@ -0,0 +1,519 @@
+"""
+Benchmark offline del camino de decisión de macd_trader.py: ejecuta el flujo
+completo de __main__ (run_once) muchas veces contra un exchange ccxt simulado
+que sirve velas grabadas y un Telegram local, y mide latencia por fase
+(imports, load_markets, fetch_ohlcv, DataFrame + df.ta.macd / motor incremental,
+save_state, alertas...), memoria pico y microbenchmarks de calculate_macd frente
+a implementaciones alternativas. Los resultados van a JSON para comparar commits.
+
+Uso:
+    python benchmarks/bench_macd_trader.py [--runs 200] [--candles velas.json|ohlcv.npy]
+        [--engine ring|pandas|both] [--mode cron|daemon] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import functools
+import statistics
+import subprocess
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYMBOL = "ADA/USD"
+TIMEFRAME = "1h"
+TF_MS = 3600 * 1000
+
+# Fases medidas (tiempo exclusivo: lo que gastan las funciones anidadas se
+# atribuye a su propia fase, no a la que las llama).
+PHASES = (
+    "load_state", "check_shutdown_and_drawdown", "init_exchange", "fetch_total_balance_in_usd",
+    "get_historical_data", "calculate_macd", "calculate_indicators", "generate_signal",
+    "calculate_trailing_stop", "execute_real_trade", "send_telegram_alert", "commit_state",
+)
+
+
+# ============================================================
+# VELAS GRABADAS Y EXCHANGE SIMULADO
+# ============================================================
+def synthetic_candles(count, seed=7, start_price=0.45):
+    """ Paseo aleatorio con tendencias alternas (produce cruces MACD reales). """
+    rng = random.Random(seed)
+    t0 = (int(time.time() * 1000) // TF_MS - count) * TF_MS
+    price, candles = start_price, []
+    for i in range(count):
+        drift = 0.002 if (i // 40) % 2 == 0 else -0.002
+        open_ = price
+        price = max(0.01, price * (1 + drift + rng.gauss(0, 0.006)))
+        high = max(open_, price) * (1 + abs(rng.gauss(0, 0.002)))
+        low = min(open_, price) * (1 - abs(rng.gauss(0, 0.002)))
+        candles.append([t0 + i * TF_MS, round(open_, 6), round(high, 6), round(low, 6),
+                        round(price, 6), round(rng.uniform(1e4, 5e5), 2)])
+    return candles
+
+
+def load_candles(path):
+    """ Velas desde un JSON (respuesta fetch_ohlcv guardada) o un backfill NPY. """
+    if path.endswith(".npy") or os.path.isdir(path):
+        from backfill import load_backfill
+        return load_backfill(path)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class StubExchange:
+    """
+    Sustituto de ccxt.kraken: sirve las velas grabadas como si el tiempo
+    avanzara una vela por ciclo (advance()). `latency_ms` simula la red.
+    """
+    id = "kraken"
+
+    def __init__(self, candles, limit, latency_ms=0.0):
+        self.candles = candles
+        self.cursor = limit
+        self.latency = latency_ms / 1000
+        self.markets = None
+        self.currencies = None
+        # Como ccxt.kraken: opciones auxiliares que fetch_markets rellena y la caché de mercados guarda.
+        self.options = {"marketHelperProps": ["marketsByAltname"], "marketsByAltname": {}}
+        self.calls = {}
+
+    def __call__(self, config=None):
+        # ccxt.kraken({...}) en init_exchange devuelve siempre esta instancia.
+        return self
+
+    def _network(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def advance(self):
+        self.cursor = self.cursor + 1 if self.cursor < len(self.candles) else self.cursor
+
+    def load_markets(self, reload=False):
+        self._network("load_markets")
+        base, quote = SYMBOL.split("/")
+        # Catálogo sintético con el tamaño aproximado del de Kraken (~1000 pares).
+        self.markets = {f"P{i}/USD": {"id": f"P{i}USD", "symbol": f"P{i}/USD", "base": f"P{i}",
+                                      "quote": "USD", "precision": {"amount": 8, "price": 5},
+                                      "limits": {"amount": {"min": 1}}} for i in range(1000)}
+        self.markets[SYMBOL] = {"id": f"{base}{quote}", "symbol": SYMBOL, "base": base, "quote": quote}
+        self.currencies = {"USD": {"id": "ZUSD", "code": "USD"}, base: {"id": base, "code": base}}
+        self.options["marketsByAltname"] = {m["id"]: m for m in self.markets.values()}
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets, self.currencies = markets, currencies
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params=None):
+        self._network("fetch_ohlcv")
+        window = self.candles[:self.cursor]
+        return [list(c) for c in (window[-limit:] if limit else window)]
+
+    def fetch_balance(self, params=None):
+        self._network("fetch_balance")
+        return {"total": {"USD": 5000.0, "ADA": 0.0}}
+
+    def fetch_ticker(self, symbol, params=None):
+        self._network("fetch_ticker")
+        return {"symbol": symbol, "last": self.candles[self.cursor - 1][4]}
+
+
+# ============================================================
+# TELEGRAM LOCAL
+# ============================================================
+class TelegramStandIn:
+    """ Servidor HTTP local que acepta sendMessage y cuenta los mensajes. """
+
+    def __init__(self, latency_ms=0.0):
+        stand_in = self
+        self.messages = 0
+        self.latency = latency_ms / 1000
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                stand_in.messages += 1
+                body = b'{"ok": true, "result": {}}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ============================================================
+# MEDICIÓN POR FASE
+# ============================================================
+class PhaseTimer:
+    """ Envuelve funciones del módulo y acumula tiempo exclusivo por fase y ciclo. """
+
+    def __init__(self):
+        self.stack = []
+        self.current = {}
+        self.samples = {}
+
+    def wrap(self, module, name):
+        original = getattr(module, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            self.stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = self.stack.pop()
+                if self.stack:
+                    self.stack[-1] += elapsed
+                self.current[name] = self.current.get(name, 0.0) + elapsed - children
+        setattr(module, name, timed)
+
+    def end_run(self):
+        for name, seconds in self.current.items():
+            self.samples.setdefault(name, []).append(seconds * 1000)
+        self.current = {}
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"n": len(ordered), "mean_ms": statistics.mean(ordered), "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95), "max_ms": ordered[-1], "total_ms": sum(ordered)}
+
+
+# ============================================================
+# IMPORTS (EN SUBPROCESOS, PARA MEDIR EN FRÍO)
+# ============================================================
+def bench_imports(repeat, env):
+    results = {}
+    for module in ("ccxt", "pandas", "pandas_ta", "requests", "macd_trader"):
+        samples = []
+        for _ in range(repeat):
+            code = (f"import time; t = time.perf_counter(); import {module}; "
+                    f"print((time.perf_counter() - t) * 1000)")
+            out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                samples = None
+                results[module] = {"error": out.stderr.strip().splitlines()[-1]}
+                break
+            samples.append(float(out.stdout.strip().splitlines()[-1]))
+        if samples:
+            results[module] = summarize(samples)
+    return results
+
+
+# ============================================================
+# FLUJO COMPLETO DE DECISIÓN
+# ============================================================
+def bench_decision(mt, candles, args, engine, workdir):
+    mt.INDICATOR_ENGINE = engine
+    mt.STATE_FILE = os.path.join(workdir, f"state_{engine}.json")
+    mt.MARKETS_CACHE_FILE = os.path.join(workdir, "markets_cache.json")
+
+    stub = StubExchange(candles, mt.LIMIT, latency_ms=args.exchange_latency)
+    original_kraken = mt.ccxt.kraken
+    mt.ccxt.kraken = stub
+    wrapped = PHASES + ("save_markets_cache", "load_markets_cache")
+    originals = {name: getattr(mt, name) for name in wrapped + ("generate_signal",)}
+    timer = PhaseTimer()
+    for name in wrapped:
+        timer.wrap(mt, name)
+    timer.wrap(stub, "load_markets") # Descarga del catálogo dentro de init_exchange
+
+    signals = {}
+    timed_signal = mt.generate_signal
+
+    def record_signal(df):
+        signal = timed_signal(df)
+        signals[signal] = signals.get(signal, 0) + 1
+        return signal
+    mt.generate_signal = record_signal
+
+    totals = []
+    cache_hits = {}
+
+    def collect_cache_hits():
+        if mt.exchange is None:
+            return
+        for name, hits in mt.exchange.stats()["cache_hits_by_endpoint"].items():
+            cache_hits[name] = cache_hits.get(name, 0) + hits
+
+    tracemalloc.start()
+    try:
+        for i in range(args.runs):
+            if args.mode == "cron":
+                collect_cache_hits()
+                # Proceso nuevo por ejecución: sin exchange ni motor en memoria.
+                mt.exchange = None
+                mt._indicator_engine = None
+                mt._state_store = None
+            if i == 0 and os.path.exists(mt.MARKETS_CACHE_FILE):
+                os.remove(mt.MARKETS_CACHE_FILE) # Primer ciclo en frío: descarga de mercados
+
+            start = time.perf_counter()
+            code = mt.run_once()
+            totals.append((time.perf_counter() - start) * 1000)
+            timer.end_run()
+            if code != 0:
+                raise RuntimeError(f"run_once retornó {code} en el ciclo {i}")
+            stub.advance()
+            if mt.exchange is not None:
+                # Entre dos velas reales la caché TTL caduca y el contador de Kraken
+                # decae entero; sin esto el ciclo mediría aciertos de caché o esperas.
+                mt.exchange.invalidate()
+                mt.exchange._counter.counter = 0.0
+        _, peak = tracemalloc.get_traced_memory()
+        collect_cache_hits()
+    finally:
+        tracemalloc.stop()
+        for name, fn in originals.items():
+            setattr(mt, name, fn)
+        mt.ccxt.kraken = original_kraken
+
+    start = time.perf_counter()
+    mt.flush_alerts()
+    flush_ms = (time.perf_counter() - start) * 1000
+    mt._alert_queue = None
+    mt.exchange = None
+    mt._indicator_engine = None
+
+    phases = {name: summarize(s) for name, s in timer.samples.items()}
+    return {
+        "engine": engine,
+        "mode": args.mode,
+        "run_once": summarize(totals[1:] or totals),
+        "cold_first_run_ms": totals[0],
+        "phases": dict(sorted(phases.items(), key=lambda kv: -kv[1]["total_ms"])),
+        "alert_flush_ms": flush_ms,
+        "exchange_calls": stub.calls,
+        "exchange_cache_hits": cache_hits,
+        "signals_observed": signals,
+        "tracemalloc_peak_kib": peak / 1024,
+    }
+
+
+# ============================================================
+# MICROBENCHMARKS: calculate_macd Y ALTERNATIVAS
+# ============================================================
+def _ema_python(values, length):
+    """ EMA con semilla SMA (la misma convención que pandas_ta). """
+    alpha = 2 / (length + 1)
+    out = [None] * len(values)
+    if len(values) < length:
+        return out
+    ema = sum(values[:length]) / length
+    out[length - 1] = ema
+    for i in range(length, len(values)):
+        ema = alpha * values[i] + (1 - alpha) * ema
+        out[i] = ema
+    return out
+
+
+def macd_python(klines, fast=12, slow=26, signal=9):
+    closes = [float(k[4]) for k in klines]
+    ema_fast, ema_slow = _ema_python(closes, fast), _ema_python(closes, slow)
+    macd = [f - s for f, s in zip(ema_fast, ema_slow) if s is not None]
+    sig = _ema_python(macd, signal)
+    return macd[-1], sig[-1], macd[-1] - sig[-1] if sig[-1] is not None else None
+
+
+def macd_pandas_ewm(klines, fast=12, slow=26, signal=9):
+    import pandas as pd
+    close = pd.Series([k[4] for k in klines], dtype="float64")
+    macd = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+    sig = macd.ewm(span=signal, adjust=False).mean()
+    return macd.iloc[-1], sig.iloc[-1], macd.iloc[-1] - sig.iloc[-1]
+
+
+def bench_micro(mt, candles, repeat, limit):
+    import pandas as pd
+    from indicators import MACD, IndicatorEngine
+
+    klines = candles[:limit]
+    extra = candles[limit] if len(candles) > limit else None
+
+    def reference():
+        row = mt.calculate_macd(klines).iloc[-1]
+        return row["MACD_12_26_9"], row["MACDs_12_26_9"], row["MACDh_12_26_9"]
+
+    def engine_full():
+        engine = IndicatorEngine(capacity=max(500, limit))
+        engine.register(MACD(12, 26, 9))
+        engine.extend(klines)
+        values = engine.values()
+        return values["MACD_12_26_9"], values["MACDs_12_26_9"], values["MACDh_12_26_9"]
+
+    warm = IndicatorEngine(capacity=max(500, limit))
+    warm.register(MACD(12, 26, 9))
+    warm.extend(klines[:-1])
+
+    def engine_push():
+        # Coste marginal de una vela nueva con el motor ya caliente (modo daemon).
+        warm.push(klines[-1] if extra is None else extra)
+        values = warm.values()
+        return values["MACD_12_26_9"], values["MACDs_12_26_9"], values["MACDh_12_26_9"]
+
+    def dataframe_build():
+        df = pd.DataFrame(klines, columns=["Timestamp", "Open", "High", "Low", "Close", "Volume"])
+        df["Date"] = pd.to_datetime(df["Timestamp"], unit="ms")
+        return None
+
+    df_ready = pd.DataFrame(klines, columns=["Timestamp", "Open", "High", "Low", "Close", "Volume"])
+
+    def ta_macd_only():
+        df_ready.ta.macd(close="Close", fast=12, slow=26, signal=9, append=False)
+        return None
+
+    candidates = {
+        "calculate_macd (pandas_ta)": reference,
+        "dataframe_build": dataframe_build,
+        "df.ta.macd": ta_macd_only,
+        "pandas_ewm": lambda: macd_pandas_ewm(klines),
+        "python_loop": lambda: macd_python(klines),
+        "indicator_engine_full": engine_full,
+        "indicator_engine_push": engine_push,
+    }
+    expected = reference()
+    results = {}
+    for name, fn in candidates.items():
+        fn() # Calentamiento
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = fn()
+            samples.append((time.perf_counter() - start) * 1e6)
+        row = {"mean_us": statistics.mean(samples), "p50_us": statistics.median(samples),
+               "min_us": min(samples)}
+        if value is not None and name != "indicator_engine_push":
+            row["max_abs_diff"] = max(abs(float(a) - float(b)) for a, b in zip(value, expected))
+        results[name] = row
+    return results
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200, help="Ciclos run_once por motor.")
+    parser.add_argument("--candles", help="Velas grabadas (JSON fetch_ohlcv o backfill .npy).")
+    parser.add_argument("--limit", type=int, default=50, help="LIMIT de velas por ciclo.")
+    parser.add_argument("--engine", choices=("ring", "pandas", "both"), default="both")
+    parser.add_argument("--mode", choices=("cron", "daemon"), default="cron",
+                        help="cron: estado en memoria se pierde entre ciclos; daemon: se conserva.")
+    parser.add_argument("--exchange-latency", type=float, default=0.0, help="ms simulados por llamada.")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="ms simulados por sendMessage.")
+    parser.add_argument("--micro-repeat", type=int, default=500)
+    parser.add_argument("--import-repeat", type=int, default=3, help="0 para omitir los imports.")
+    parser.add_argument("--verbose", action="store_true", help="Mantener los logs INFO del bot.")
+    parser.add_argument("--json", help="Guardar resultados en JSON.")
+    args = parser.parse_args()
+
+    candles = load_candles(args.candles) if args.candles else synthetic_candles(args.runs + args.limit + 100)
+    if len(candles) < args.limit + 1:
+        parser.error(f"Se necesitan al menos {args.limit + 1} velas.")
+
+    telegram = TelegramStandIn(latency_ms=args.telegram_latency)
+    workdir = tempfile.mkdtemp(prefix="bench_macd_")
+    env = dict(os.environ)
+    env.update({
+        "PAPER_TRADING_MODE": "True",
+        "SYMBOL": SYMBOL,
+        "TIMEFRAME": TIMEFRAME,
+        "LIMIT": str(args.limit),
+        "MAX_DRAWDOWN": "1.0", # Sin cooldown: se mide siempre el ciclo completo
+        "TELEGRAM_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "1",
+        "TELEGRAM_LOGS_CHAT_ID": "2",
+        "TELEGRAM_API_URL": telegram.url,
+        "ALERT_QUEUE_SIZE": "10000",
+        "STATE_FILE": os.path.join(workdir, "state.json"),
+        "MARKETS_CACHE_FILE": os.path.join(workdir, "markets_cache.json"),
+        "MARKET_DATA_DIR": os.path.join(workdir, "market_data"),
+        "MARKET_DATA_MAX_AGE": "0", # Cada ciclo pasa por fetch_ohlcv
+        "CACHE_TTL_OHLCV": "0", # ... y llega al exchange, no a la caché TTL de CachedExchange
+        "CACHE_TTL_BALANCE": "0",
+        "EXECUTION_STATS_FILE": os.path.join(workdir, "execution_stats.json"),
+        "STOP_WATCHER": "False",
+    })
+    env.pop("WARMUP_FILE", None)
+    env.pop("BOT_ENV_FILE", None)
+
+    results = {
+        "meta": {"git": git_revision(), "python": platform.python_version(), "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "candles": len(candles)},
+    }
+    if args.import_repeat:
+        results["imports"] = bench_imports(args.import_repeat, env)
+
+    os.environ.update(env)
+    import macd_trader as mt
+    mt.load_config()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    engines = ("ring", "pandas") if args.engine == "both" else (args.engine,)
+    results["decision"] = {engine: bench_decision(mt, candles, args, engine, workdir) for engine in engines}
+    results["decision_alerts_received"] = telegram.messages
+    results["micro"] = bench_micro(mt, candles, args.micro_repeat, args.limit)
+    results["maxrss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    telegram.close()
+
+    for module, row in results.get("imports", {}).items():
+        print(f"import {module:<12} " + (f"{row['mean_ms']:8.1f} ms" if "mean_ms" in row else row["error"]))
+    for engine, row in results["decision"].items():
+        total = row["run_once"]
+        print(f"\nrun_once [{engine}/{row['mode']}] media {total['mean_ms']:.2f} ms | p95 {total['p95_ms']:.2f} ms "
+              f"| primer ciclo {row['cold_first_run_ms']:.1f} ms | pico {row['tracemalloc_peak_kib']:.0f} KiB")
+        print(f"  llamadas al exchange {row['exchange_calls']} | aciertos de caché {row['exchange_cache_hits']}")
+        if row["exchange_cache_hits"].get("fetch_ohlcv"):
+            print(f"  AVISO: {row['exchange_cache_hits']['fetch_ohlcv']} fetch_ohlcv servidos desde la caché; "
+                  f"esos ciclos no miden la descarga de velas.")
+        for name, phase in row["phases"].items():
+            print(f"  {name:<28} media {phase['mean_ms']:8.3f} ms  p95 {phase['p95_ms']:8.3f} ms  ({phase['n']} ciclos)")
+    print("\nMicrobenchmarks (velas = LIMIT):")
+    for name, row in results["micro"].items():
+        diff = f"  |dif| {row['max_abs_diff']:.2e}" if "max_abs_diff" in row else ""
+        print(f"  {name:<28} {row['mean_us']:10.1f} µs{diff}")
+    print(f"\nRSS máximo: {results['maxrss_kib'] / 1024:.1f} MiB | alertas recibidas: {telegram.messages}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark del parser RSS/Atom en streaming (rss_parser.parse_fast) frente a
+feedparser, sobre feeds sintéticos con la forma de los feeds reales de
+noticias (CDATA, content:encoded con HTML largo, media:*, Atom con xhtml) o
+sobre archivos de feeds guardados pasados con --feed.
+
+Uso:
+    python benchmarks/bench_rss.py [--feed archivo.xml ...] [--repeat 50] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rss_parser import parse_fast, parse_feedparser
+
+WORDS = ("banco central inflación mercado bitcoin récord crisis reservas interés "
+         "inversión cloud automatización python datos sube cae desplome").split()
+
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def make_rss(items=50, body_paragraphs=12, seed=1):
+    """ RSS 2.0 estilo agencia de noticias: CDATA, HTML embebido y media:content. """
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+           'xmlns:media="http://search.yahoo.com/mrss/" xmlns:dc="http://purl.org/dc/elements/1.1/">',
+           '<channel><title>Noticias</title><link>https://example.com</link>'
+           '<description>Economía y mercados</description>']
+    for i in range(items):
+        body = "".join(f"<p>{_sentence(rng, 40)} <a href='https://example.com/{i}/{p}'>más</a></p>"
+                       for p in range(body_paragraphs))
+        out.append(
+            f"<item><title><![CDATA[{_sentence(rng, 10)} &amp; {i}]]></title>"
+            f"<link>https://example.com/noticia/{i}</link>"
+            f"<guid isPermaLink=\"false\">id-{i}</guid>"
+            f"<pubDate>Mon, 0{i % 9 + 1} Sep 2025 10:{i % 60:02d}:00 +0000</pubDate>"
+            f"<dc:creator>Redacción</dc:creator><category>Economía</category>"
+            f"<description><![CDATA[{_sentence(rng, 30)}]]></description>"
+            f"<content:encoded><![CDATA[{body}]]></content:encoded>"
+            f"<media:content url=\"https://example.com/img/{i}.jpg\" medium=\"image\">"
+            f"<media:title>{_sentence(rng, 5)}</media:title></media:content></item>"
+        )
+    out.append("</channel></rss>")
+    return "\n".join(out).encode("utf-8")
+
+
+def make_atom(entries=30, body_paragraphs=8, seed=2):
+    """ Atom con contenido xhtml y varios <link> por entrada. """
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="utf-8"?>',
+           '<feed xmlns="http://www.w3.org/2005/Atom"><title>Blog</title>'
+           '<id>urn:blog</id><updated>2025-09-01T10:00:00Z</updated>']
+    for i in range(entries):
+        body = "".join(f"<p>{_sentence(rng, 40)}</p>" for _ in range(body_paragraphs))
+        out.append(
+            f"<entry><title type=\"html\">{_sentence(rng, 9)} &lt;em&gt;{i}&lt;/em&gt;</title>"
+            f"<link rel=\"alternate\" href=\"https://blog.example.com/{i}\"/>"
+            f"<link rel=\"replies\" href=\"https://blog.example.com/{i}#c\"/>"
+            f"<id>urn:entry:{i}</id><published>2025-09-01T10:{i % 60:02d}:00Z</published>"
+            f"<updated>2025-09-01T11:{i % 60:02d}:00Z</updated>"
+            f"<author><name>Autor</name></author>"
+            f"<content type=\"xhtml\"><div xmlns=\"http://www.w3.org/1999/xhtml\">{body}</div></content></entry>"
+        )
+    out.append("</feed>")
+    return "\n".join(out).encode("utf-8")
+
+
+def _time(fn, content, repeat, **kwargs):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        entries = fn(content, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"mean_ms": statistics.mean(samples), "median_ms": statistics.median(samples),
+            "min_ms": min(samples), "entries": len(entries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--feed", action="append", default=[], help="Archivo de feed real (repetible).")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--max-entries", type=int, default=10, help="Para medir la parada temprana.")
+    parser.add_argument("--json", help="Guardar resultados en JSON.")
+    args = parser.parse_args()
+
+    feeds = {"rss_noticias": make_rss(), "atom_blog": make_atom()}
+    for path in args.feed:
+        with open(path, "rb") as f:
+            feeds[os.path.basename(path)] = f.read()
+
+    try:
+        import feedparser  # noqa: F401
+        have_feedparser = True
+    except ImportError:
+        have_feedparser = False
+        print("feedparser no está instalado: sólo se mide el parser en streaming.")
+
+    results = {}
+    for name, content in feeds.items():
+        row = {"bytes": len(content),
+               "fast": _time(parse_fast, content, args.repeat),
+               "fast_early_stop": _time(parse_fast, content, args.repeat, max_entries=args.max_entries)}
+        if have_feedparser:
+            row["feedparser"] = _time(parse_feedparser, content, max(1, args.repeat // 5))
+            row["speedup"] = row["feedparser"]["mean_ms"] / row["fast"]["mean_ms"]
+        results[name] = row
+
+        line = (f"{name:<20} {len(content) / 1024:8.1f} KiB | streaming {row['fast']['mean_ms']:8.2f} ms "
+                f"| parada temprana ({args.max_entries}) {row['fast_early_stop']['mean_ms']:8.2f} ms")
+        if have_feedparser:
+            line += f" | feedparser {row['feedparser']['mean_ms']:8.2f} ms | x{row['speedup']:.1f}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
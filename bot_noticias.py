@@ -3,13 +3,17 @@ import os
 import urllib.parse
 import asyncio
 import telegram
-import feedparser
 import httpx
 import toml
 from datetime import datetime, timedelta
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, constants
 from tinydb import TinyDB, Query
 
+from market_data import MarketDataCache, snapshot_from_kraken_ticker, ticker_key
+from news_index import NewsIndex
+from news_scoring import categorize_headline, score_headline
+from rss_parser import parse_feed
+
 # ==============================================================================
 # 🚨 CONFIGURACIÓN - LECTURA DESDE config.toml
 # ==============================================================================
@@ -29,10 +33,16 @@ BOT_TOKEN = config['telegram']['bot_token']
 CHAT_ID = config['telegram']['chat_id']
 ADMIN_WHATSAPP_PHONE = config['telegram']['admin_whatsapp_phone']
 RSS_URLS = config['rss']['urls']
+RSS_MAX_ENTRIES = config['rss'].get('max_entries')  # None = todas las entradas del feed
 KRAKEN_API = config['api']['kraken_url']
 API_TIMEOUT = config['api']['api_timeout']
 DB_PATH = config['database']['db_path']
 
+# Caché de mercado compartida con macd_trader.py (mismo directorio en ambos bots)
+MARKET_DATA_DIR = config.get('cache', {}).get('market_data_dir', 'market_data')
+MARKET_DATA_MAX_AGE = config.get('cache', {}).get('ticker_max_age', 30)
+MARKET_DATA = MarketDataCache(MARKET_DATA_DIR, source="bot_noticias")
+
 # Inicialización de la base de datos TinyDB
 db = TinyDB(DB_PATH)
 PriceTable = db.table('prices')
@@ -40,53 +50,9 @@ NewsTable = db.table('news')
 PriceQuery = Query()
 NewsQuery = Query()
 
-# ----------------------------------------------------------------------------------
-# 🚨 NUEVA IMPLEMENTACIÓN 1: DICCIONARIO DE PALABRAS CLAVE TEMÁTICAS
-# ----------------------------------------------------------------------------------
-
-# Palabras clave para categorizar la noticia por tema (Data Automation, Economía, Tech)
-THEME_KEYWORDS = {
-    "ECONOMIA": [
-        "interés", "reservas", "inflación", "banco central", "recorte",
-        "inversión", "pública", "privada", "fmi", "opec", "ceo", "mercado"
-    ],
-    "TECNOLOGIA": [
-        "IA", "LLM", "cloud", "automatización", "5G", "algoritmo",
-        "machine learning", "quantum", "openai", "google", "microsoft"
-    ],
-    "DATA/AUTO": [
-        "data pipeline", "ETL", "airflow", "kubernetes", "sql", "databricks",
-        "snowflake", "big data", "automatización", "python"
-    ]
-}
-
-# Definición de pesos para el sentimiento (EXISTENTE)
-POSITIVE_KEYWORDS = {
-    # ... (Tu diccionario POSITIVE_KEYWORDS existente) ...
-    "sube": 1,
-    "ganancia": 1,
-    "recuperación": 1,
-    "aumenta": 1,
-    "supera": 1,
-    "récord": 2,
-    "máximos": 2,
-    "disparo": 2,
-    "explota": 2,
-    "rompe": 2,
-    "adopción": 2
-}
-NEGATIVE_KEYWORDS = {
-    # ... (Tu diccionario NEGATIVE_KEYWORDS existente) ...
-    "cae": -1,
-    "pérdida": -1,
-    "baja": -1,
-    "colapso": -2,
-    "caída libre": -2,
-    "desplome": -2,
-    "crisis": -2,
-    "liquida": -2
-}
-
+# Índice invertido de titulares (búsquedas por palabra clave/categoría/fecha y dedup)
+NEWS_INDEX_PATH = config['database'].get('index_path', f"{DB_PATH}.index.json")
+NewsIdx = NewsIndex.load(NEWS_INDEX_PATH)
 
 # ----------------------------------------------------------------------------------
 # --- FUNCIONES DE UTILIDAD (SIN CAMBIOS) ---
@@ -131,6 +97,7 @@ def clean_old_news(days_ago: int = 7) -> None:
         limit_date = datetime.now() - timedelta(days=days_ago)
         limit_iso = limit_date.isoformat()
         NewsTable.remove(NewsQuery.timestamp < limit_iso)
+        NewsIdx.prune(limit_date)
         print(
             f"DEBUG DB: Limpieza de noticias completada. Eliminadas las anteriores a {limit_date.strftime('%Y-%m-%d')}"
         )
@@ -148,6 +115,7 @@ async def get_market_sentiment_and_news_rss(client: httpx.AsyncClient) -> dict:
     news_report_list = []
     sentiment_score = 0
     clean_old_news()
+    NewsIdx.sync(NewsTable)
 
     for rss_url in RSS_URLS:
         try:
@@ -155,50 +123,21 @@ async def get_market_sentiment_and_news_rss(client: httpx.AsyncClient) -> dict:
             rss_response = await client.get(rss_url, timeout=API_TIMEOUT)
             rss_response.raise_for_status()
 
-            feed = feedparser.parse(rss_response.content)
+            # Parser en streaming (title/link/guid/fecha); feedparser sólo como respaldo.
+            entries = parse_feed(rss_response.content, max_entries=RSS_MAX_ENTRIES)
 
-            for entry in feed.entries:
+            for entry in entries:
                 headline = entry.title
                 headline_lower = headline.lower()
 
-                if NewsTable.search(NewsQuery.headline == headline):
+                if NewsIdx.contains(headline):
                     continue
 
                 # =======================================================
-                # 📢 NUEVA LÓGICA: ASIGNACIÓN DE CATEGORÍA TEMÁTICA
+                # 📢 CATEGORÍA TEMÁTICA Y SCORE DE SENTIMIENTO (news_scoring.py)
                 # =======================================================
-                category = "GENERAL"
-                for cat_name, keywords in THEME_KEYWORDS.items():
-                    if category != "GENERAL":
-                        break  # Ya tiene una categoría, optimizamos
-                    for keyword in keywords:
-                        if keyword in headline_lower:
-                            category = cat_name
-                            break  # Salir del bucle interno
-
-                # =======================================================
-                # 📢 LÓGICA DE NEGOCIO: CÁLCULO DE SCORE DE SENTIMIENTO
-                # =======================================================
-                score = 0
-                sugerencia = "📊 Consolidación."
-
-                for keyword, weight in POSITIVE_KEYWORDS.items():
-                    if keyword in headline_lower:
-                        score += weight
-
-                for keyword, weight in NEGATIVE_KEYWORDS.items():
-                    if keyword in headline_lower:
-                        score += weight
-
-                # Asignación de la sugerencia (output para el usuario final)
-                if score >= 2:
-                    sugerencia = "🟢 Fuerte Alcista."
-                elif score == 1:
-                    sugerencia = "📈 Alcista."
-                elif score <= -2:
-                    sugerencia = "🔴 Fuerte Bajista."
-                elif score == -1:
-                    sugerencia = "📉 Bajista."
+                category = categorize_headline(headline_lower)
+                score, sugerencia = score_headline(headline_lower)
 
                 sentiment_score += score
 
@@ -207,11 +146,13 @@ async def get_market_sentiment_and_news_rss(client: httpx.AsyncClient) -> dict:
                 # =======================================================
 
                 # Almacena la noticia y su categoría para persistencia.
-                NewsTable.insert({
+                record = {
                     'headline': headline,
                     'category': category,  # <--- CAMBIO: Guardar la categoría
+                    'score': score,
                     'timestamp': datetime.now().isoformat()
-                })
+                }
+                NewsIdx.add(NewsTable.insert(record), record)
 
                 # 🚨 FILTRO DE CALIDAD DE DATOS: Solo agregamos al reporte si NO es GENERAL
                 if category != "GENERAL" and len(news_report_list) < 5:
@@ -231,6 +172,11 @@ async def get_market_sentiment_and_news_rss(client: httpx.AsyncClient) -> dict:
             print(f"DEBUG RSS: ERROR GENÉRICO al procesar {rss_url}: {e}")
             continue
 
+    try:
+        NewsIdx.save()
+    except Exception as e:
+        print(f"DEBUG INDEX: Error guardando el índice de noticias: {e}")
+
     # ... (Retorno de datos existente) ...
     if not news_report_list:
         return ({
@@ -254,20 +200,29 @@ async def get_market_sentiment_and_news_rss(client: httpx.AsyncClient) -> dict:
 # ----------------------------------------------------------------------------------
 
 
-async def get_crypto_metrics_via_api(client: httpx.AsyncClient) -> dict:
-    # ... (función existente sin cambios) ...
-    try:
-        response = await client.get(KRAKEN_API, timeout=API_TIMEOUT)
-        print(f"DEBUG: Status Code de Kraken: {response.status_code}")
-        response.raise_for_status()
-        data = response.json()
+async def fetch_btc_ticker_snapshot(client: httpx.AsyncClient) -> dict:
+    """
+    Consulta el Ticker REST de Kraken y lo normaliza al formato de la caché
+    de mercado compartida.
+    """
+    response = await client.get(KRAKEN_API, timeout=API_TIMEOUT)
+    print(f"DEBUG: Status Code de Kraken: {response.status_code}")
+    response.raise_for_status()
+    data = response.json()
+
+    if 'error' in data and data['error']:
+        raise ValueError(f"Error de Kraken: {data['error']}")
+
+    return snapshot_from_kraken_ticker(data['result']['XXBTZUSD'], "BTC/USD")
 
-        if 'error' in data and data['error']:
-            raise ValueError(f"Error de Kraken: {data['error']}")
 
-        ticker_data = data['result']['XXBTZUSD']
-        btc_price_float = float(ticker_data['c'][0])
-        open_price_float = float(ticker_data['o'])
+async def get_crypto_metrics_via_api(client: httpx.AsyncClient) -> dict:
+    try:
+        # Se reutiliza el ticker si otro bot lo refrescó hace menos de MARKET_DATA_MAX_AGE s.
+        ticker = await MARKET_DATA.aget(ticker_key("BTC/USD"), MARKET_DATA_MAX_AGE,
+                                        lambda: fetch_btc_ticker_snapshot(client))
+        btc_price_float = ticker['last']
+        open_price_float = ticker['open']
 
         btc_price_formatted = f"${btc_price_float:,.2f}"
         change_24h_raw = (
@@ -0,0 +1,184 @@
+import copy
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CACHÉ TTL + PRESUPUESTO DE LLAMADAS PARA EL EXCHANGE CCXT
+# ============================================================
+# CachedExchange envuelve una instancia ccxt y:
+#   - sirve fetch_balance / fetch_ticker / fetch_ohlcv desde caché con TTL por endpoint;
+#   - fusiona llamadas idénticas en vuelo (varios hilos -> una sola petición);
+#   - modela el contador de llamadas privadas de Kraken (sube con cada llamada y
+#     decae con el tiempo según el nivel de la cuenta) y espera antes de
+#     exceder el máximo, en lugar de recibir 'EAPI:Rate limit exceeded'.
+# El resto de atributos se delegan sin cambios a la instancia ccxt.
+
+DEFAULT_TTLS = {
+    "fetch_balance": 30.0,
+    "fetch_ticker": 2.0,
+    "fetch_ohlcv": 10.0,
+}
+
+# Nivel de cuenta Kraken -> (contador máximo, decaimiento por segundo)
+KRAKEN_TIERS = {
+    "starter": (15, 0.33),
+    "intermediate": (20, 0.5),
+    "pro": (20, 1.0),
+}
+
+# Coste en el contador de las llamadas privadas (las órdenes usan otro límite).
+PRIVATE_COSTS = {
+    "fetch_balance": 1,
+    "fetch_order": 1,
+    "fetch_orders": 1,
+    "fetch_open_orders": 1,
+    "fetch_closed_orders": 1,
+    "fetch_my_trades": 2,
+    "fetch_ledger": 2,
+}
+
+# Llamadas que modifican el balance y por tanto invalidan su caché.
+BALANCE_MUTATORS = ("create_order", "cancel_order", "cancel_all_orders")
+
+
+class KrakenCallCounter:
+    """ Modelo local del contador de llamadas privadas de Kraken. """
+
+    def __init__(self, tier="starter"):
+        self.max_counter, self.decay_per_second = KRAKEN_TIERS.get(tier, KRAKEN_TIERS["starter"])
+        self.counter = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _decay(self):
+        now = time.monotonic()
+        self.counter = max(0.0, self.counter - (now - self.updated) * self.decay_per_second)
+        self.updated = now
+
+    def acquire(self, cost):
+        """ Reserva `cost` unidades; espera si se excedería el máximo. Retorna segundos esperados. """
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._decay()
+                if self.counter + cost <= self.max_counter:
+                    self.counter += cost
+                    return waited
+                wait = (self.counter + cost - self.max_counter) / self.decay_per_second
+            time.sleep(wait)
+            waited += wait
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CachedExchange:
+    """ Proxy de una instancia ccxt con caché TTL, llamadas fusionadas y presupuesto. """
+
+    def __init__(self, exchange, ttls=None, tier="starter"):
+        self._exchange = exchange
+        self._ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._counter = KrakenCallCounter(tier)
+        self._cache = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "cache_hits": 0, "merged": 0, "budget_waits": 0, "budget_wait_seconds": 0.0}
+        self._hits_by_endpoint = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name in PRIVATE_COSTS or name in BALANCE_MUTATORS:
+            def wrapped(*args, **kwargs):
+                return self._call(name, attr, args, kwargs)
+            return wrapped
+        return attr
+
+    # --------------------------------------------------------
+    # Endpoints cacheados
+    # --------------------------------------------------------
+    def fetch_balance(self, params=None):
+        return self._cached("fetch_balance", (), {"params": params or {}})
+
+    def fetch_ticker(self, symbol, params=None):
+        return self._cached("fetch_ticker", (symbol,), {"params": params or {}})
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params=None):
+        return self._cached("fetch_ohlcv", (symbol,),
+                            {"timeframe": timeframe, "since": since, "limit": limit, "params": params or {}})
+
+    def invalidate(self, name=None):
+        """ Vacía la caché completa o la de un endpoint. """
+        with self._lock:
+            for key in [k for k in self._cache if name is None or k[0] == name]:
+                del self._cache[key]
+
+    def stats(self):
+        """ Contadores de uso: llamadas reales, aciertos de caché, fusionadas y esperas. """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_hits_by_endpoint"] = dict(self._hits_by_endpoint)
+        stats["calls_saved"] = stats["cache_hits"] + stats["merged"]
+        stats["rate_counter"] = round(self._counter.counter, 2)
+        return stats
+
+    # --------------------------------------------------------
+    # Internos
+    # --------------------------------------------------------
+    def _call(self, name, method, args, kwargs):
+        cost = PRIVATE_COSTS.get(name, 0)
+        if cost:
+            waited = self._counter.acquire(cost)
+            if waited:
+                logger.info(f"Presupuesto de llamadas Kraken: {name} esperó {waited:.1f}s.")
+                with self._lock:
+                    self._stats["budget_waits"] += 1
+                    self._stats["budget_wait_seconds"] += waited
+        with self._lock:
+            self._stats["calls"] += 1
+        result = method(*args, **kwargs)
+        if name in BALANCE_MUTATORS:
+            self.invalidate("fetch_balance")
+        return result
+
+    def _cached(self, name, args, kwargs):
+        key = (name, args, repr(sorted(kwargs.items())))
+        ttl = self._ttls.get(name, 0)
+
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and time.monotonic() - hit[0] < ttl:
+                self._stats["cache_hits"] += 1
+                self._hits_by_endpoint[name] = self._hits_by_endpoint.get(name, 0) + 1
+                return copy.deepcopy(hit[1])
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = _InFlight()
+            else:
+                self._stats["merged"] += 1
+
+        if not owner:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = self._call(name, getattr(self._exchange, name), args, kwargs)
+            with self._lock:
+                self._cache[key] = (time.monotonic(), flight.result)
+            return copy.deepcopy(flight.result)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.event.set()
@@ -0,0 +1,172 @@
+import os
+import json
+import math
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# SEGUIMIENTO DE EJECUCIÓN: FILLS, LATENCIAS Y SLIPPAGE
+# ============================================================
+# Tras create_order se sondea fetch_order hasta que la orden se llena (o vence
+# el plazo) para obtener el precio medio real y las comisiones. Por cada fill se
+# registran los instantes de señal, envío, acuse y llenado, y el slippage contra
+# el precio de decisión. Las estadísticas acumuladas por símbolo (media/desvío
+# con Welford, máximo) se guardan en un JSON junto con los últimos fills.
+
+FINAL_STATUSES = ("closed", "canceled", "cancelled", "expired", "rejected")
+RECENT_FILLS = 50
+METRICS = ("signal_to_fill_ms", "submit_to_ack_ms", "ack_to_fill_ms", "slippage_bps")
+
+
+def _update_running(stat, value):
+    """ Actualiza {count, mean, m2, max} con el algoritmo de Welford. """
+    stat["count"] = stat.get("count", 0) + 1
+    delta = value - stat.get("mean", 0.0)
+    stat["mean"] = stat.get("mean", 0.0) + delta / stat["count"]
+    stat["m2"] = stat.get("m2", 0.0) + delta * (value - stat["mean"])
+    stat["max"] = max(stat.get("max", value), value)
+    stat["std"] = math.sqrt(stat["m2"] / stat["count"]) if stat["count"] > 1 else 0.0
+    return stat
+
+
+def order_fees(order):
+    """ Suma de comisiones de una orden ccxt, por moneda. """
+    fees = {}
+    for fee in order.get("fees") or ([order["fee"]] if order.get("fee") else []):
+        if fee and fee.get("cost") is not None:
+            currency = fee.get("currency") or "?"
+            fees[currency] = fees.get(currency, 0.0) + float(fee["cost"])
+    return fees
+
+
+def order_average_price(order):
+    """ Precio medio de llenado (average, o cost/filled); None si aún no hay fill. """
+    if order.get("average"):
+        return float(order["average"])
+    filled = order.get("filled") or 0
+    if filled and order.get("cost"):
+        return float(order["cost"]) / float(filled)
+    return None
+
+
+class ExecutionTracker:
+    """ Sigue órdenes hasta su llenado y mantiene métricas de ejecución por símbolo. """
+
+    def __init__(self, exchange, stats_file="execution_stats.json",
+                 poll_interval=0.5, timeout=30.0):
+        self.exchange = exchange
+        self.stats_file = stats_file
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def wait_for_fill(self, order, symbol):
+        """ Sondea fetch_order hasta un estado final o hasta agotar el plazo. """
+        deadline = time.time() + self.timeout
+        while True:
+            if order.get("status") in FINAL_STATUSES and order_average_price(order):
+                return order
+            if time.time() >= deadline:
+                logger.warning(f"Orden {order.get('id')} sin llenado completo tras {self.timeout:.0f}s (status={order.get('status')}).")
+                return order
+            time.sleep(self.poll_interval)
+            try:
+                order = self.exchange.fetch_order(order["id"], symbol)
+            except Exception as e:
+                logger.warning(f"Error consultando la orden {order.get('id')}: {e}")
+            if order.get("status") in FINAL_STATUSES and order.get("status") != "closed":
+                return order
+
+    def track(self, order, symbol, side, decision_price, signal_ts, submit_ts, ack_ts):
+        """
+        Espera el llenado de `order` y registra el fill. Retorna un dict con el
+        precio medio real (None si no hubo llenado), comisiones y métricas.
+        """
+        order = self.wait_for_fill(order, symbol)
+        fill_price = order_average_price(order)
+        fill_ts = time.time()
+        if order.get("lastTradeTimestamp"):
+            fill_ts = min(fill_ts, order["lastTradeTimestamp"] / 1000)
+        fill_ts = max(fill_ts, ack_ts)
+
+        fill = {
+            "order_id": order.get("id"),
+            "symbol": symbol,
+            "side": side,
+            "status": order.get("status"),
+            "decision_price": decision_price,
+            "fill_price": fill_price,
+            "filled": order.get("filled"),
+            "fees": order_fees(order),
+            "signal_ts": signal_ts,
+            "submit_ts": submit_ts,
+            "ack_ts": ack_ts,
+            "fill_ts": fill_ts,
+            "signal_to_fill_ms": (fill_ts - signal_ts) * 1000,
+            "submit_to_ack_ms": (ack_ts - submit_ts) * 1000,
+            "ack_to_fill_ms": (fill_ts - ack_ts) * 1000,
+            "slippage_bps": None,
+        }
+        if fill_price is None:
+            logger.warning(f"Orden {fill['order_id']} sin precio de llenado; no se registran métricas.")
+            return fill
+
+        # Slippage positivo = ejecución peor que el precio de decisión.
+        direction = 1 if side == "buy" else -1
+        fill["slippage_bps"] = direction * (fill_price - decision_price) / decision_price * 10000
+        self.record(fill)
+        logger.info(
+            f"Fill {symbol} {side}: {fill_price:.6f} (decisión {decision_price:.6f}, "
+            f"slippage {fill['slippage_bps']:.1f} bps, señal→fill {fill['signal_to_fill_ms']:.0f} ms, "
+            f"comisiones {fill['fees']})"
+        )
+        return fill
+
+    # --------------------------------------------------------
+    # Estadísticas persistentes
+    # --------------------------------------------------------
+    def load_stats(self):
+        try:
+            with open(self.stats_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Estadísticas de ejecución ilegibles, se reinician: {e}")
+            return {}
+
+    def record(self, fill):
+        """ Acumula el fill en las estadísticas del símbolo (escritura atómica). """
+        stats = self.load_stats()
+        sym = stats.setdefault(fill["symbol"], {"metrics": {}, "recent": []})
+        for metric in METRICS:
+            _update_running(sym["metrics"].setdefault(metric, {}), fill[metric])
+        sym["recent"] = (sym["recent"] + [fill])[-RECENT_FILLS:]
+
+        tmp_path = f"{self.stats_file}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp_path, self.stats_file)
+        except Exception as e:
+            logger.error(f"No se pudieron guardar las estadísticas de ejecución: {e}")
+
+    def summary(self, symbol):
+        """ Resumen {métrica: (media, desvío, máximo, n)} para un símbolo. """
+        metrics = self.load_stats().get(symbol, {}).get("metrics", {})
+        return {name: (m["mean"], m["std"], m["max"], m["count"]) for name, m in metrics.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Métricas de ejecución (latencia/slippage) por símbolo.")
+    parser.add_argument("stats_file", nargs="?", default=os.getenv("EXECUTION_STATS_FILE", "execution_stats.json"))
+    args = parser.parse_args()
+
+    tracker = ExecutionTracker(None, stats_file=args.stats_file)
+    for symbol in tracker.load_stats():
+        print(symbol)
+        for name, (mean, std, peak, count) in tracker.summary(symbol).items():
+            print(f"  {name:<18} media={mean:10.2f} desvío={std:10.2f} máx={peak:10.2f} n={count}")
@@ -0,0 +1,318 @@
+import math
+from array import array
+
+# ============================================================
+# MOTOR DE INDICADORES INCREMENTALES SOBRE UN RING BUFFER OHLCV
+# ============================================================
+# CandleRing guarda las últimas `capacity` velas en arrays de doubles
+# preasignados (un array por campo). Cada indicador registrado en el motor se
+# actualiza en O(1) al llegar una vela nueva, leyendo sólo la vela entrante (y,
+# en los de ventana, la que sale). Memoria y coste por vela son constantes sin
+# importar cuánto historial se haya procesado.
+#
+# Los nombres de salida siguen las columnas de pandas_ta (MACD_12_26_9, RSI_14,
+# ATRr_14, BBU_20_2.0, ...) y las fórmulas replican sus valores por defecto en
+# la versión fijada en requirements.txt (0.4.71b0, sin TA-Lib): EMA y ATR
+# sembradas con SMA, RMA como ewm(alpha=1/n, adjust=False) desde el primer valor,
+# desvío de Bollinger con ddof=1.
+
+FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+
+
+class CandleRing:
+    """ Buffer circular de capacidad fija para velas OHLCV. """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._columns = [array("d", bytes(8 * capacity)) for _ in FIELDS]
+        self._head = 0 # Próxima posición de escritura
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _index(self, i):
+        """ Posición física del elemento i (negativo = desde la vela más reciente). """
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError("índice fuera del ring buffer")
+        return (self._head - self.size + i) % self.capacity
+
+    def append(self, candle):
+        for column, value in zip(self._columns, candle):
+            column[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def replace_last(self, candle):
+        pos = self._index(-1)
+        for column, value in zip(self._columns, candle):
+            column[pos] = value
+
+    def get(self, field, i=-1):
+        """ Valor de `field` ('close', 'high', ...) en la vela i (por defecto, la última). """
+        return self._columns[FIELDS.index(field)][self._index(i)]
+
+    def candle(self, i=-1):
+        pos = self._index(i)
+        return [column[pos] for column in self._columns]
+
+    def to_klines(self):
+        """ Velas en orden cronológico con el formato de fetch_ohlcv. """
+        return [self.candle(i) for i in range(self.size)]
+
+
+# ------------------------------------------------------------
+# Indicadores incrementales
+# ------------------------------------------------------------
+class _EMA:
+    """
+    EMA sembrada con la SMA de los primeros `period` valores (como pandas_ta).
+    Con alpha=1/period es la RMA presembrada que usa el ATR.
+    """
+
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.value = None
+
+    def update(self, x):
+        self.count += 1
+        if self.value is None:
+            self.total += x
+            if self.count == self.period:
+                self.value = self.total / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class _RMA:
+    """ Media de Wilder como ewm(alpha=1/period, adjust=False): arranca en el primer valor. """
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.reset()
+
+    def reset(self):
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class EMA:
+    def __init__(self, period=20, field="close"):
+        self.field = field
+        self.name = f"EMA_{period}"
+        self._ema = _EMA(period)
+        self.window = 1
+
+    def reset(self):
+        self._ema.reset()
+
+    def update(self, ring):
+        self._ema.update(ring.get(self.field))
+
+    def values(self):
+        return {self.name: self._ema.value}
+
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.suffix = f"{fast}_{slow}_{signal}"
+        self._fast = _EMA(fast)
+        self._slow = _EMA(slow)
+        self._signal = _EMA(signal)
+        self.macd = None
+        self.window = 1
+
+    def reset(self):
+        for ema in (self._fast, self._slow, self._signal):
+            ema.reset()
+        self.macd = None
+
+    def update(self, ring):
+        close = ring.get("close")
+        fast = self._fast.update(close)
+        slow = self._slow.update(close)
+        if fast is not None and slow is not None:
+            self.macd = fast - slow
+            self._signal.update(self.macd)
+
+    def values(self):
+        signal = self._signal.value
+        hist = self.macd - signal if signal is not None else None
+        return {
+            f"MACD_{self.suffix}": self.macd,
+            f"MACDh_{self.suffix}": hist,
+            f"MACDs_{self.suffix}": signal,
+        }
+
+
+class RSI:
+    def __init__(self, period=14):
+        self.name = f"RSI_{period}"
+        self._gain = _RMA(period)
+        self._loss = _RMA(period)
+        self.window = 2
+
+    def reset(self):
+        self._gain.reset()
+        self._loss.reset()
+
+    def update(self, ring):
+        if len(ring) < 2:
+            return
+        change = ring.get("close", -1) - ring.get("close", -2)
+        self._gain.update(max(change, 0.0))
+        self._loss.update(max(-change, 0.0))
+
+    def values(self):
+        gain, loss = self._gain.value, self._loss.value
+        if gain is None or loss is None:
+            return {self.name: None}
+        total = gain + loss
+        return {self.name: 100.0 * gain / total if total else 50.0}
+
+
+class ATR:
+    def __init__(self, period=14):
+        self.name = f"ATRr_{period}"
+        self._rma = _EMA(period, alpha=1.0 / period) # RMA sembrada con la SMA del rango verdadero
+        self.window = 2
+
+    def reset(self):
+        self._rma.reset()
+
+    def update(self, ring):
+        high, low = ring.get("high"), ring.get("low")
+        if self._rma.count == 0:
+            true_range = high - low # Primera vela: sin cierre previo
+        else:
+            prev_close = ring.get("close", -2)
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self._rma.update(true_range)
+
+    def values(self):
+        return {self.name: self._rma.value}
+
+
+class BollingerBands:
+    def __init__(self, period=20, std=2.0):
+        self.period = period
+        self.std = float(std)
+        self.suffix = f"{period}_{self.std}"
+        self.window = period + 1
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, ring):
+        close = ring.get("close")
+        self.total += close
+        self.total_sq += close * close
+        self.count += 1
+        if self.count > self.period:
+            # La vela que sale de la ventana sigue en el ring (window = period + 1).
+            leaving = ring.get("close", -(self.period + 1))
+            self.total -= leaving
+            self.total_sq -= leaving * leaving
+
+    def values(self):
+        if self.count < self.period:
+            return {f"BBL_{self.suffix}": None, f"BBM_{self.suffix}": None, f"BBU_{self.suffix}": None}
+        mean = self.total / self.period
+        variance = (self.total_sq - self.total * mean) / (self.period - 1)
+        deviation = math.sqrt(max(variance, 0.0))
+        return {
+            f"BBL_{self.suffix}": mean - self.std * deviation,
+            f"BBM_{self.suffix}": mean,
+            f"BBU_{self.suffix}": mean + self.std * deviation,
+        }
+
+
+# ------------------------------------------------------------
+# Motor
+# ------------------------------------------------------------
+class IndicatorEngine:
+    """
+    Un único ring buffer de velas compartido por todos los indicadores
+    registrados; cada vela nueva los actualiza en una sola pasada.
+    """
+
+    def __init__(self, capacity=500):
+        self.ring = CandleRing(capacity)
+        self.indicators = []
+
+    def register(self, indicator):
+        if indicator.window > self.ring.capacity:
+            raise ValueError(f"Capacidad {self.ring.capacity} menor que la ventana de {type(indicator).__name__}.")
+        self.indicators.append(indicator)
+        self.rebuild()
+        return indicator
+
+    def __len__(self):
+        return len(self.ring)
+
+    @property
+    def last_timestamp(self):
+        return self.ring.get("timestamp") if len(self.ring) else None
+
+    def push(self, candle):
+        """
+        Añade una vela cerrada. Un timestamp repetido reemplaza la última vela y
+        recalcula los indicadores desde el buffer; uno más antiguo se ignora.
+        """
+        last_ts = self.last_timestamp
+        if last_ts is not None and candle[0] < last_ts:
+            return False
+        if last_ts is not None and candle[0] == last_ts:
+            if self.ring.candle() == [float(v) for v in candle[:len(FIELDS)]]:
+                return False
+            self.ring.replace_last(candle)
+            self.rebuild()
+            return True
+
+        self.ring.append(candle)
+        for indicator in self.indicators:
+            indicator.update(self.ring)
+        return True
+
+    def extend(self, klines):
+        """ Añade sólo las velas nuevas de una respuesta fetch_ohlcv. Retorna cuántas. """
+        return sum(1 for candle in klines if self.push(candle))
+
+    def rebuild(self):
+        """ Recalcula todos los indicadores recorriendo el buffer actual. """
+        klines = self.ring.to_klines()
+        self.ring = CandleRing(self.ring.capacity)
+        for indicator in self.indicators:
+            indicator.reset()
+        for candle in klines:
+            self.ring.append(candle)
+            for indicator in self.indicators:
+                indicator.update(self.ring)
+
+    def values(self):
+        """ Últimos valores: OHLCV de la vela más reciente + salidas de cada indicador. """
+        if not len(self.ring):
+            return {}
+        latest = dict(zip(("Timestamp", "Open", "High", "Low", "Close", "Volume"), self.ring.candle()))
+        for indicator in self.indicators:
+            latest.update(indicator.values())
+        return latest
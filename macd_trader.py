@@ -1,8 +1,12 @@
 import os
 import json
 import time
+import fcntl
+import atexit
 import logging
+import threading
 import traceback
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 import ccxt
@@ -11,6 +15,15 @@ import pandas_ta as ta
 import requests
 from ccxt.base.errors import ExchangeError, NetworkError # Importar NetworkError
 
+from alert_queue import AlertQueue
+from backfill import load_backfill
+from exchange_cache import CachedExchange
+from execution_tracker import ExecutionTracker
+from indicators import ATR, EMA, MACD, RSI, BollingerBands, IndicatorEngine
+from market_data import MarketDataCache, ohlcv_key, snapshot_from_ccxt_ticker, ticker_key
+from resample import Resampler
+from state_store import StateStore
+
 # ============================================================
 # CONFIGURACIÓN DE LOGGING
 # ============================================================
@@ -24,121 +37,321 @@ logger = logging.getLogger(__name__)
 # ============================================================
 # CONFIGURACIÓN DE ENTORNO Y CONSTANTES (MODO REAL)
 # ============================================================
-API_KEY = os.getenv("KRAKEN_API_KEY")
-SECRET_KEY = os.getenv("KRAKEN_SECRET_KEY")
+def load_config():
+    """ Lee (o vuelve a leer) la configuración desde las variables de entorno. """
+    global API_KEY, SECRET_KEY, PAPER_TRADING_MODE, SYMBOL, MICRO_QTY, \
+        TIMEFRAME, LIMIT, RISK_PER_TRADE, MAX_DRAWDOWN, COOLDOWN_HOURS, \
+        TRAILING_PERCENT, MIN_PROFIT_TRIGGER, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, \
+        TELEGRAM_LOGS_CHAT_ID, STATE_FILE, STATE_SNAPSHOT_EVERY, MARKETS_CACHE_FILE, \
+        MARKETS_CACHE_TTL_HOURS, CANDLE_CLOSE_OFFSET_SECONDS, BOT_ENV_FILE, \
+        WATCH_INTERVAL_SECONDS, PRICE_FEED_URL, STOP_WATCHER, \
+        TELEGRAM_API_URL, ALERT_QUEUE_SIZE, ALERT_FLUSH_SECONDS, \
+        EXECUTION_STATS_FILE, FILL_TIMEOUT_SECONDS, FILL_POLL_SECONDS, \
+        KRAKEN_TIER, CACHE_TTL_BALANCE, CACHE_TTL_TICKER, CACHE_TTL_OHLCV, \
+        INDICATOR_ENGINE, RING_CAPACITY, SIGNAL_FILTERS, RSI_OVERBOUGHT, \
+        MARKET_DATA_DIR, MARKET_DATA_MAX_AGE, WARMUP_FILE, \
+        BASE_TIMEFRAME, BASE_LIMIT, BASE_CAPACITY, CONFIRM_TIMEFRAMES
+
+    API_KEY = os.getenv("KRAKEN_API_KEY")
+    SECRET_KEY = os.getenv("KRAKEN_SECRET_KEY")
+
+    # MODO DE EJECUCIÓN: Leer de Secrets (True = Paper, False = Real)
+    PAPER_TRADING_MODE = os.getenv("PAPER_TRADING_MODE", "True").lower() == "true" 
+
+    # PARÁMETROS ESPECÍFICOS PARA ADA/USD
+    SYMBOL = os.getenv("SYMBOL", "ADA/USD")
+    MICRO_QTY = float(os.getenv("MICRO_QTY", "10")) # Cantidad base para pruebas reales (ej: 10 ADA)
+
+    # Timeframe y Límite de Velas
+    TIMEFRAME = os.getenv("TIMEFRAME", "1h")
+    LIMIT = int(os.getenv("LIMIT", "50")) 
+
+    # Serie base opcional (ej: "1h"): TIMEFRAME y CONFIRM_TIMEFRAMES se derivan de
+    # ella localmente con una sola llamada fetch_ohlcv por ciclo (resample.py).
+    # CONFIRM_TIMEFRAMES (ej: "4h") frena los BUY si el MACD de esos timeframes es bajista.
+    # Cada uno necesita (MACD_MIN_CANDLES + 2) × (timeframe / base) velas base entre
+    # BASE_LIMIT y WARMUP_FILE: "4h" desde "1h" cabe en 720; "1d" requiere WARMUP_FILE.
+    BASE_TIMEFRAME = os.getenv("BASE_TIMEFRAME", "")
+    BASE_LIMIT = int(os.getenv("BASE_LIMIT", "720")) # Máximo que devuelve Kraken por llamada
+    BASE_CAPACITY = int(os.getenv("BASE_CAPACITY", "20000"))
+    CONFIRM_TIMEFRAMES = [t.strip() for t in os.getenv("CONFIRM_TIMEFRAMES", "").split(",") if t.strip()]
+
+    # Indicadores: "ring" (motor incremental, indicators.py) o "pandas" (pandas_ta).
+    # SIGNAL_FILTERS combina la señal MACD con otros indicadores (ej: "rsi,bbands").
+    INDICATOR_ENGINE = os.getenv("INDICATOR_ENGINE", "ring").lower()
+    RING_CAPACITY = int(os.getenv("RING_CAPACITY", "500"))
+    SIGNAL_FILTERS = [f.strip().lower() for f in os.getenv("SIGNAL_FILTERS", "").split(",") if f.strip()]
+    RSI_OVERBOUGHT = float(os.getenv("RSI_OVERBOUGHT", "70"))
+    # Histórico de backfill.py (ohlcv.npy o su directorio) para precalentar el motor
+    # (o la serie base, si BASE_TIMEFRAME está activo; debe ser de ese timeframe).
+    WARMUP_FILE = os.getenv("WARMUP_FILE")
+
+    # Control de riesgo
+    RISK_PER_TRADE = float(os.getenv("RISK_PER_TRADE", "0.01"))
+    MAX_DRAWDOWN = float(os.getenv("MAX_DRAWDOWN", "0.05"))
+    COOLDOWN_HOURS = int(os.getenv("COOLDOWN_HOURS", "24"))
+
+    # PARÁMETROS DE TRAILING STOP LOSS (SL DINÁMICO)
+    TRAILING_PERCENT = float(os.getenv("TRAILING_PERCENT", "0.005"))
+    MIN_PROFIT_TRIGGER = float(os.getenv("MIN_PROFIT_TRIGGER", "0.01"))
+
+    # Telegram alerts via env vars
+    TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+    TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    TELEGRAM_LOGS_CHAT_ID = os.getenv("TELEGRAM_LOGS_CHAT_ID")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "100"))
+    ALERT_FLUSH_SECONDS = float(os.getenv("ALERT_FLUSH_SECONDS", "5"))
+
+    # Persistencia de estado
+    STATE_FILE = os.getenv("STATE_FILE", "bot_state.json")
+    STATE_SNAPSHOT_EVERY = int(os.getenv("STATE_SNAPSHOT_EVERY", "50"))
 
-# MODO DE EJECUCIÓN: Leer de Secrets (True = Paper, False = Real)
-PAPER_TRADING_MODE = os.getenv("PAPER_TRADING_MODE", "True").lower() == "true" 
+    # Caché en disco del catálogo de mercados de Kraken (markets/currencies)
+    MARKETS_CACHE_FILE = os.getenv("MARKETS_CACHE_FILE", "markets_cache.json")
+    MARKETS_CACHE_TTL_HOURS = float(os.getenv("MARKETS_CACHE_TTL_HOURS", "24"))
 
-# PARÁMETROS ESPECÍFICOS PARA ADA/USD
-SYMBOL = os.getenv("SYMBOL", "ADA/USD")
-MICRO_QTY = float(os.getenv("MICRO_QTY", "10")) # Cantidad base para pruebas reales (ej: 10 ADA)
+    # Caché TTL por endpoint y nivel de cuenta Kraken (contador de llamadas privadas)
+    KRAKEN_TIER = os.getenv("KRAKEN_TIER", "starter")
+    CACHE_TTL_BALANCE = float(os.getenv("CACHE_TTL_BALANCE", "30"))
+    CACHE_TTL_TICKER = float(os.getenv("CACHE_TTL_TICKER", "2"))
+    CACHE_TTL_OHLCV = float(os.getenv("CACHE_TTL_OHLCV", "10"))
 
-# Timeframe y Límite de Velas
-TIMEFRAME = os.getenv("TIMEFRAME", "1h")
-LIMIT = int(os.getenv("LIMIT", "50")) 
+    # Caché de mercado en disco compartida con bot_noticias.py
+    MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", "market_data")
+    MARKET_DATA_MAX_AGE = float(os.getenv("MARKET_DATA_MAX_AGE", "10"))
 
-# Control de riesgo
-RISK_PER_TRADE = float(os.getenv("RISK_PER_TRADE", "0.01"))
-MAX_DRAWDOWN = float(os.getenv("MAX_DRAWDOWN", "0.05"))
-COOLDOWN_HOURS = int(os.getenv("COOLDOWN_HOURS", "24"))
+    # Modo residente (daemon): segundos de espera tras el cierre de cada vela antes
+    # de evaluar, y archivo KEY=VALUE opcional que se recarga en caliente.
+    CANDLE_CLOSE_OFFSET_SECONDS = float(os.getenv("CANDLE_CLOSE_OFFSET_SECONDS", "5"))
+    BOT_ENV_FILE = os.getenv("BOT_ENV_FILE")
 
-# PARÁMETROS DE TRAILING STOP LOSS (SL DINÁMICO)
-TRAILING_PERCENT = float(os.getenv("TRAILING_PERCENT", "0.005"))
-MIN_PROFIT_TRIGGER = float(os.getenv("MIN_PROFIT_TRIGGER", "0.01"))
+    # Vigilancia intrabar del trailing stop: intervalo de sondeo y fuente de precio
+    # opcional con formato Ticker de Kraken (por defecto exchange.fetch_ticker).
+    WATCH_INTERVAL_SECONDS = float(os.getenv("WATCH_INTERVAL_SECONDS", "2"))
+    PRICE_FEED_URL = os.getenv("PRICE_FEED_URL")
+    STOP_WATCHER = os.getenv("STOP_WATCHER", "True").lower() == "true"
 
-# Telegram alerts via env vars
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-TELEGRAM_LOGS_CHAT_ID = os.getenv("TELEGRAM_LOGS_CHAT_ID")
+    # Seguimiento de fills (precio medio real, comisiones, latencia y slippage)
+    EXECUTION_STATS_FILE = os.getenv("EXECUTION_STATS_FILE", "execution_stats.json")
+    FILL_TIMEOUT_SECONDS = float(os.getenv("FILL_TIMEOUT_SECONDS", "30"))
+    FILL_POLL_SECONDS = float(os.getenv("FILL_POLL_SECONDS", "0.5"))
 
-# Persistencia de estado
-STATE_FILE = os.getenv("STATE_FILE", "bot_state.json")
+load_config()
 
 # ============================================================
 # INICIALIZACIÓN DE EXCHANGE CCXT
 # ============================================================
-# ... (Bloque de inicialización de CCXT sin cambios) ...
+# El exchange se crea de forma perezosa con init_exchange(), después del chequeo
+# de cooldown, para que una ejecución que sale por cooldown no pague la descarga
+# completa del catálogo de mercados.
 
 exchange = None
-try:
-    exchange = ccxt.kraken({
-        "enableRateLimit": True,
-        "apiKey": API_KEY,
-        "secret": SECRET_KEY,
-    })
-    exchange.load_markets()
-    logger.info("Exchange Kraken inicializado correctamente.")
-except Exception as e:
-    logger.critical("¡¡ERROR CRÍTICO AL INICIALIZAR CCXT!!")
-    logger.critical(f"Razón: {e}")
-    traceback.print_exc()
-    raise SystemExit(1)
+
+def market_helper_options(ex):
+    """
+    Opciones que fetch_markets rellena junto a los mercados (en Kraken,
+    marketsByAltname y delistedMarketsById, que parse_order usa para resolver
+    pares como XBT/USD). ccxt las declara en options['marketHelperProps'].
+    """
+    return {key: ex.options.get(key) for key in ex.options.get("marketHelperProps", [])}
+
+def load_markets_cache(ex):
+    """ Carga markets/currencies (y sus opciones auxiliares) desde la caché en disco si sigue vigente. """
+    try:
+        with open(MARKETS_CACHE_FILE, "r") as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.warning(f"Caché de mercados ilegible, se descargará de nuevo: {e}")
+        return False
+
+    age_seconds = time.time() - float(cache.get("timestamp", 0))
+    if age_seconds > MARKETS_CACHE_TTL_HOURS * 3600:
+        logger.info(f"Caché de mercados expirada ({age_seconds / 3600:.1f}h).")
+        return False
+    if cache.get("exchange") != ex.id or cache.get("ccxt_version") != ccxt.__version__:
+        logger.info("Caché de mercados de otro exchange/versión de ccxt. Se ignora.")
+        return False
+    helpers = cache.get("options", {})
+    if any(key not in helpers for key in market_helper_options(ex)):
+        logger.info("Caché de mercados sin las opciones auxiliares de ccxt. Se descargará de nuevo.")
+        return False
+
+    try:
+        ex.set_markets(cache["markets"], cache.get("currencies"))
+        for key, value in helpers.items():
+            if value is not None:
+                ex.options[key] = value
+    except Exception as e:
+        logger.warning(f"No se pudo aplicar la caché de mercados: {e}")
+        return False
+    return True
+
+def save_markets_cache(ex):
+    """ Guarda markets/currencies y sus opciones auxiliares en disco (escritura atómica con rename). """
+    cache = {
+        "timestamp": time.time(),
+        "exchange": ex.id,
+        "ccxt_version": ccxt.__version__,
+        "markets": ex.markets,
+        "currencies": ex.currencies,
+        "options": market_helper_options(ex),
+    }
+    tmp_path = f"{MARKETS_CACHE_FILE}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, default=str)
+        os.replace(tmp_path, MARKETS_CACHE_FILE)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la caché de mercados: {e}")
+
+def init_exchange():
+    """
+    Inicializa el exchange Kraken (una sola vez por proceso). Los mercados se
+    cargan offline desde la caché en disco y sólo se descargan si expiró. La
+    instancia queda envuelta en CachedExchange (caché TTL + presupuesto de llamadas).
+    """
+    global exchange
+    if exchange is not None:
+        return exchange
+
+    try:
+        ex = ccxt.kraken({
+            "enableRateLimit": True,
+            "apiKey": API_KEY,
+            "secret": SECRET_KEY,
+        })
+        if load_markets_cache(ex):
+            logger.info("Mercados de Kraken cargados desde caché en disco.")
+        else:
+            ex.load_markets()
+            save_markets_cache(ex)
+            logger.info("Mercados de Kraken descargados y guardados en caché.")
+        exchange = CachedExchange(ex, tier=KRAKEN_TIER, ttls={
+            "fetch_balance": CACHE_TTL_BALANCE,
+            "fetch_ticker": CACHE_TTL_TICKER,
+            "fetch_ohlcv": CACHE_TTL_OHLCV,
+        })
+        logger.info("Exchange Kraken inicializado correctamente.")
+        return exchange
+    except Exception as e:
+        logger.critical("¡¡ERROR CRÍTICO AL INICIALIZAR CCXT!!")
+        logger.critical(f"Razón: {e}")
+        traceback.print_exc()
+        raise SystemExit(1)
 
 # ============================================================
 # UTILIDADES DE ESTADO Y ALERTAS
 # ============================================================
-# ... (load_state, save_state, send_telegram_alert sin cambios) ...
+# Estado persistente vía StateStore (snapshot atómico + journal, ver state_store.py).
+
+DEFAULT_STATE = {
+    "initial_balance": None,
+    "cumulative_loss": 0.0,
+    "shutdown_until": None,
+    "position_open": False,
+    "entry_price": 0.0,
+    "last_stop_price": 0.0,
+    "position_qty": 0.0, # Añadido para el modo real
+}
+
+_state_store = None
+_pending_state = None
+_pending_reasons = []
+
+def get_state_store():
+    """ StateStore (snapshot + journal) asociado a STATE_FILE. """
+    global _state_store
+    if _state_store is None or _state_store.path != STATE_FILE:
+        _state_store = StateStore(STATE_FILE, snapshot_every=STATE_SNAPSHOT_EVERY)
+    return _state_store
 
 def load_state():
-    """ Carga el estado persistente del bot. """
-    # ... (código load_state) ...
-    if not os.path.exists(STATE_FILE):
-        return {
-            "initial_balance": None,
-            "cumulative_loss": 0.0,
-            "shutdown_until": None,
-            "position_open": False,
-            "entry_price": 0.0,
-            "last_stop_price": 0.0,
-            "position_qty": 0.0, # Añadido para el modo real
-        }
+    """ Carga el estado persistente del bot (snapshot + journal). """
     try:
-        with open(STATE_FILE, "r") as f:
-            state = json.load(f)
-            state.setdefault("position_open", False)
-            state.setdefault("entry_price", 0.0)
-            state.setdefault("last_stop_price", 0.0)
-            state.setdefault("position_qty", 0.0) # Añadido para el modo real
-            return state
+        state, _ = get_state_store().load()
     except Exception as e:
-        # ... (código de manejo de error) ...
-        logger.error(f"No se pudo leer el archivo de estado: {e}")
-        return {
-            "initial_balance": None,
-            "cumulative_loss": 0.0,
-            "shutdown_until": None,
-            "position_open": False,
-            "entry_price": 0.0,
-            "last_stop_price": 0.0,
-            "position_qty": 0.0,
-        }
-
-def save_state(state):
-    # ... (código save_state sin cambios) ...
+        logger.critical(f"No se pudo leer el estado persistente: {e}")
+        raise
+    for key, value in DEFAULT_STATE.items():
+        state.setdefault(key, value)
+    return state
+
+def save_state(state, reason="save"):
+    """
+    Marca el estado como pendiente de persistir. Las escrituras de un ciclo se
+    agrupan y se confirman una sola vez con commit_state().
+    """
+    global _pending_state
+    _pending_state = state
+    _pending_reasons.append(reason)
+
+def commit_state():
+    """ Confirma el estado pendiente como una única transición del journal. """
+    global _pending_state
+    if _pending_state is None:
+        return
     try:
-        with open(STATE_FILE, "w") as f:
-            json.dump(state, f, indent=2)
+        get_state_store().commit(_pending_state, reasons=_pending_reasons)
     except Exception as e:
         logger.error(f"No se pudo guardar el archivo de estado: {e}")
+    finally:
+        _pending_state = None
+        _pending_reasons.clear()
+
+_state_thread_lock = threading.Lock()
+
+@contextmanager
+def state_lock():
+    """
+    Exclusión mutua sobre el archivo de estado entre hilos (ciclo principal y
+    watcher del trailing stop) y entre procesos (flock sobre STATE_FILE.lock).
+    """
+    with _state_thread_lock:
+        with open(f"{STATE_FILE}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+_alert_queue = None
+
+def get_alert_queue():
+    """
+    Cola de alertas en segundo plano (sesión HTTP reutilizada, batching del canal
+    de logs). Se recrea si cambia el token y se vacía al salir del proceso.
+    """
+    global _alert_queue
+    if _alert_queue is None or _alert_queue.token != TELEGRAM_TOKEN:
+        if _alert_queue is not None:
+            _alert_queue.close(ALERT_FLUSH_SECONDS)
+        _alert_queue = AlertQueue(
+            TELEGRAM_TOKEN,
+            api_url=TELEGRAM_API_URL,
+            batch_chat_ids=[TELEGRAM_LOGS_CHAT_ID],
+            maxsize=ALERT_QUEUE_SIZE,
+        )
+    return _alert_queue
+
+def flush_alerts():
+    """ Vacía la cola de alertas con plazo ALERT_FLUSH_SECONDS (registrado en atexit). """
+    if _alert_queue is not None:
+        _alert_queue.close(ALERT_FLUSH_SECONDS)
+
+atexit.register(flush_alerts)
 
 def send_telegram_alert(message, chat_id=None):
-    # ... (código send_telegram_alert sin cambios) ...
+    """ Encola una alerta de Telegram; nunca bloquea el flujo de trading. """
     target_chat_id = chat_id if chat_id else TELEGRAM_CHAT_ID 
     
     if not TELEGRAM_TOKEN or not target_chat_id:
         logger.debug(f"Telegram no configurado o target_chat_id ({target_chat_id}) es nulo. Omite alerta.")
         return
-        
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        payload = {"chat_id": target_chat_id, "text": message, "parse_mode": "Markdown"} 
-        resp = requests.post(url, data=payload, timeout=10)
-        
-        if resp.status_code != 200:
-            logger.warning(f"Fallo enviando alerta a Telegram a {target_chat_id}: {resp.text}")
-    except Exception as e:
-        logger.warning(f"Excepción al enviar alerta a Telegram: {e}")
+
+    get_alert_queue().put(target_chat_id, message)
 
 # ============================================================
 # CONTROL DE RIESGO Y COOLDOWN (PnL REAL Y BALANCE SIMULADO)
@@ -173,10 +386,10 @@ def check_shutdown_and_drawdown(state):
                 return True
             else:
                 state["shutdown_until"] = None
-                save_state(state)
+                save_state(state, "cooldown finalizado")
         except Exception:
             state["shutdown_until"] = None
-            save_state(state)
+            save_state(state, "cooldown inválido")
 
     # Chequear drawdown
     initial = state.get("initial_balance")
@@ -186,7 +399,7 @@ def check_shutdown_and_drawdown(state):
             # Activa cooldown
             shut_until = datetime.utcnow() + timedelta(hours=COOLDOWN_HOURS)
             state["shutdown_until"] = shut_until.isoformat()
-            save_state(state)
+            save_state(state, "drawdown: cooldown activado")
             msg = (f"⚠️ Drawdown ≥ {int(MAX_DRAWDOWN*100)}% alcanzado. "
                    f"Apagando bot por {COOLDOWN_HOURS}h. "
                    f"Pérdida acumulada: {cumulative_loss:.2f} USD.")
@@ -243,10 +456,30 @@ def update_pnl_and_drawdown(state, entry_price, exit_price, side):
 # ... (get_historical_data, calculate_macd, generate_signal, calculate_trailing_stop) ...
 # ============================================================
 
+_market_data = None
+
+def get_market_data():
+    """ Caché de mercado en disco compartida entre bots (MARKET_DATA_DIR). """
+    global _market_data
+    if _market_data is None or _market_data.directory != MARKET_DATA_DIR:
+        _market_data = MarketDataCache(MARKET_DATA_DIR, source="macd_trader")
+    return _market_data
+
 def get_historical_data(symbol, timeframe, limit):
-    # ... (código get_historical_data sin cambios) ...
+    """
+    Velas OHLCV vía la caché compartida: sólo se consulta a Kraken si no hay una
+    copia de menos de MARKET_DATA_MAX_AGE s, obtenida tras la apertura de la vela
+    actual y con al menos `limit` velas.
+    """
     try:
-        klines = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+        tf = timeframe_seconds(timeframe)
+        klines = get_market_data().get(
+            ohlcv_key(symbol, timeframe),
+            MARKET_DATA_MAX_AGE,
+            lambda: exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit),
+            min_fetched_at=time.time() // tf * tf,
+            accept=lambda data: len(data) >= limit,
+        )[-limit:]
         logger.info(f"Se obtuvieron {len(klines)} velas para {symbol} en {timeframe} con límite {limit}.")
         return klines
     except ExchangeError as e:
@@ -259,6 +492,114 @@ def get_historical_data(symbol, timeframe, limit):
         traceback.print_exc()
         return None
 
+_resampler = None
+_resampler_key = None
+
+def get_resampler():
+    """
+    Serie base de BASE_TIMEFRAME de la que se derivan el resto de timeframes.
+    Se recrea si cambia el par, el timeframe base o la capacidad (recarga en caliente).
+    """
+    global _resampler, _resampler_key
+    key = (SYMBOL, BASE_TIMEFRAME, BASE_CAPACITY, WARMUP_FILE)
+    if _resampler is None or _resampler_key != key:
+        resampler = Resampler(BASE_TIMEFRAME, capacity=BASE_CAPACITY)
+        if WARMUP_FILE:
+            try:
+                added = resampler.extend(load_backfill(WARMUP_FILE, timeframe=BASE_TIMEFRAME, limit=BASE_CAPACITY))
+                logger.info(f"Serie base {BASE_TIMEFRAME} precalentada con {added} velas de {WARMUP_FILE}.")
+            except Exception as e:
+                logger.warning(f"No se pudo cargar el histórico de WARMUP_FILE: {e}")
+        _resampler, _resampler_key = resampler, key
+    return _resampler
+
+def refresh_base_candles():
+    """ Una sola llamada fetch_ohlcv de BASE_TIMEFRAME alimenta todos los timeframes derivados. """
+    klines = get_historical_data(SYMBOL, timeframe=BASE_TIMEFRAME, limit=BASE_LIMIT)
+    if not klines:
+        return False
+    resampler = get_resampler()
+    changed = resampler.extend(klines)
+    logger.info(f"Serie base {BASE_TIMEFRAME}: {changed} velas nuevas o revisadas ({len(resampler)} en memoria).")
+    return True
+
+def get_candles(timeframe, limit, closed_only=False):
+    """
+    Velas de `timeframe`. Con BASE_TIMEFRAME se derivan localmente de la serie
+    base (sin llamadas de red); si no, se piden al exchange como hasta ahora.
+    """
+    if not BASE_TIMEFRAME:
+        klines = get_historical_data(SYMBOL, timeframe=timeframe, limit=limit)
+        return drop_open_candle(klines, timeframe) if klines and closed_only else klines
+
+    now_ms = time.time() * 1000 if closed_only else None
+    klines = get_resampler().candles(timeframe, limit, now_ms=now_ms)
+    if len(klines) < limit:
+        logger.warning(f"Sólo {len(klines)} velas de {timeframe} derivadas de {BASE_TIMEFRAME} (LIMIT={limit}).")
+    return klines
+
+MACD_MIN_CANDLES = 34 # 26 (EMA lenta) + 9 (señal) - 1: primera vela con MACDs_12_26_9
+
+def validate_confirm_timeframes(base_candles=None):
+    """
+    Comprueba que cada timeframe de CONFIRM_TIMEFRAMES pueda tener MACD: si no,
+    el filtro nunca frenaría un BUY. Sin `base_candles` sólo valida la configuración;
+    con él (velas base realmente en memoria tras refresh_base_candles), también que
+    el histórico alcance. Lanza ValueError con la configuración a corregir.
+    """
+    if not CONFIRM_TIMEFRAMES:
+        return
+    if LIMIT < MACD_MIN_CANDLES + 1:
+        raise ValueError(f"CONFIRM_TIMEFRAMES requiere LIMIT ≥ {MACD_MIN_CANDLES + 1} (LIMIT={LIMIT}).")
+    if not BASE_TIMEFRAME:
+        return # Cada timeframe se pide al exchange con LIMIT velas
+
+    base_seconds = timeframe_seconds(BASE_TIMEFRAME)
+    for timeframe in CONFIRM_TIMEFRAMES:
+        ratio, rest = divmod(timeframe_seconds(timeframe), base_seconds)
+        if rest or ratio < 1:
+            raise ValueError(f"CONFIRM_TIMEFRAMES={timeframe} no es múltiplo de BASE_TIMEFRAME={BASE_TIMEFRAME}.")
+        # +2 intervalos: el inicial incompleto (se descarta) y el que está en formación.
+        required = (MACD_MIN_CANDLES + 2) * ratio
+        if required > BASE_CAPACITY:
+            raise ValueError(
+                f"CONFIRM_TIMEFRAMES={timeframe} necesita {required} velas de {BASE_TIMEFRAME} y "
+                f"BASE_CAPACITY={BASE_CAPACITY} no las admite.")
+        # No se suma BASE_LIMIT: la descarga en vivo se solapa con lo que ya hay en memoria.
+        if base_candles is not None and base_candles < required:
+            raise ValueError(
+                f"CONFIRM_TIMEFRAMES={timeframe} necesita {required} velas de {BASE_TIMEFRAME} y sólo hay "
+                f"{base_candles} en memoria (BASE_LIMIT={BASE_LIMIT} + WARMUP_FILE). "
+                f"Use un BASE_TIMEFRAME mayor o un WARMUP_FILE con histórico (backfill.py).")
+
+def confirm_timeframes_ok(base_candles=None):
+    """ validate_confirm_timeframes con aviso crítico por Telegram. Retorna False si falla. """
+    try:
+        validate_confirm_timeframes(base_candles)
+        return True
+    except ValueError as e:
+        logger.critical(f"Configuración de timeframes inválida: {e}")
+        send_telegram_alert(f"🚨 **CONFIGURACIÓN INVÁLIDA**\n{e}", chat_id=TELEGRAM_CHAT_ID)
+        return False
+
+_confirm_engines = {}
+
+def higher_timeframe_histogram(timeframe):
+    """ Histograma MACD de la última vela cerrada de `timeframe` (None si no hay datos). """
+    klines = get_candles(timeframe, LIMIT, closed_only=True)
+    if not klines:
+        return None
+    if INDICATOR_ENGINE == "pandas":
+        return calculate_macd(klines).iloc[-1]["MACDh_12_26_9"]
+    # Un motor por (par, serie base, timeframe, capacidad): nunca se mezclan historiales.
+    key = (SYMBOL, BASE_TIMEFRAME, timeframe, RING_CAPACITY)
+    engine = _confirm_engines.get(key)
+    if engine is None:
+        engine = _confirm_engines[key] = IndicatorEngine(capacity=RING_CAPACITY)
+        engine.register(MACD(12, 26, 9))
+    engine.extend(klines)
+    return engine.values().get("MACDh_12_26_9")
+
 def calculate_macd(klines_data):
     # ... (código calculate_macd sin cambios) ...
     if not klines_data or len(klines_data) == 0:
@@ -271,28 +612,107 @@ def calculate_macd(klines_data):
     logger.info("MACD calculado correctamente.")
     return df
 
+_indicator_engine = None
+_indicator_engine_key = None
+
+def get_indicator_engine():
+    """
+    Motor de indicadores incremental (un único ring buffer OHLCV). En modo
+    daemon se mantiene entre ciclos y sólo procesa las velas nuevas. Si la
+    recarga en caliente cambia SYMBOL, TIMEFRAME o la capacidad, se recrea:
+    las velas del par nuevo no deben mezclarse con el historial del anterior.
+    """
+    global _indicator_engine, _indicator_engine_key
+    key = (SYMBOL, TIMEFRAME, BASE_TIMEFRAME, RING_CAPACITY, WARMUP_FILE)
+    if _indicator_engine is None or _indicator_engine_key != key:
+        engine = IndicatorEngine(capacity=RING_CAPACITY)
+        engine.register(MACD(12, 26, 9))
+        engine.register(EMA(20))
+        engine.register(RSI(14))
+        engine.register(ATR(14))
+        engine.register(BollingerBands(20, 2.0))
+        if WARMUP_FILE and not BASE_TIMEFRAME:
+            try:
+                warmup = load_backfill(WARMUP_FILE, timeframe=TIMEFRAME, limit=RING_CAPACITY)
+                engine.extend(warmup)
+                logger.info(f"Motor precalentado con {len(warmup)} velas de {WARMUP_FILE}.")
+            except Exception as e:
+                logger.warning(f"No se pudo cargar el histórico de WARMUP_FILE: {e}")
+        _indicator_engine, _indicator_engine_key = engine, key
+    return _indicator_engine
+
+def calculate_indicators(klines_data):
+    """ Alimenta el motor incremental con las velas recibidas (sólo las nuevas). """
+    if not klines_data or len(klines_data) == 0:
+        logger.warning("No se recibieron velas para calcular indicadores.")
+        return None
+
+    engine = get_indicator_engine()
+    added = engine.extend(klines_data)
+    logger.info(f"Indicadores actualizados con {added} velas nuevas ({len(engine)} en buffer).")
+    return engine
+
+def latest_values(data):
+    """ Última fila de indicadores, sea de un DataFrame (pandas_ta) o del motor. """
+    if isinstance(data, IndicatorEngine):
+        return data.values()
+    return data.iloc[-1]
+
+def _is_missing(value):
+    return value is None or pd.isna(value)
+
+def _fmt(value, decimals=5):
+    return "N/D" if _is_missing(value) else f"{value:.{decimals}f}"
+
 def generate_signal(df):
-    # ... (código generate_signal sin cambios) ...
+    """
+    Señal MACD (cruce con la línea de señal). Con SIGNAL_FILTERS se combina con
+    RSI/Bollinger: un BUY se degrada a HOLD si el mercado está sobreextendido;
+    con CONFIRM_TIMEFRAMES, también si el MACD de esos timeframes es bajista.
+    Acepta un DataFrame de calculate_macd o el IndicatorEngine.
+    """
     if df is None or len(df) == 0:
         logger.warning("No hay datos para generar señal.")
         return "NO DATA"
 
-    last = df.iloc[-1]
+    last = latest_values(df)
     macd_line = last["MACD_12_26_9"]
     signal_line = last["MACDs_12_26_9"]
     
-    if pd.isna(macd_line) or pd.isna(signal_line):
+    if _is_missing(macd_line) or _is_missing(signal_line):
         return "HOLD"
 
     if macd_line > signal_line:
-        return "BUY"
+        signal = "BUY"
     elif macd_line < signal_line:
         return "SELL"
     else:
         return "HOLD"
 
-def calculate_trailing_stop(state, current_price):
-    # ... (código calculate_trailing_stop sin cambios) ...
+    # Filtros de confirmación (sólo frenan entradas, nunca salidas)
+    rsi = last.get("RSI_14")
+    if "rsi" in SIGNAL_FILTERS and not _is_missing(rsi) and rsi >= RSI_OVERBOUGHT:
+        logger.info(f"BUY filtrado por RSI ({rsi:.1f} ≥ {RSI_OVERBOUGHT:.0f}).")
+        return "HOLD"
+    upper_band = last.get("BBU_20_2.0")
+    if "bbands" in SIGNAL_FILTERS and not _is_missing(upper_band) and last["Close"] > upper_band:
+        logger.info(f"BUY filtrado por Bollinger (cierre {last['Close']:.4f} > banda superior {upper_band:.4f}).")
+        return "HOLD"
+    for timeframe in CONFIRM_TIMEFRAMES:
+        histogram = higher_timeframe_histogram(timeframe)
+        if _is_missing(histogram):
+            logger.error(f"Sin MACD en {timeframe} para confirmar el BUY (faltan velas); se mantiene HOLD.")
+            return "HOLD"
+        if histogram < 0:
+            logger.info(f"BUY filtrado por MACD bajista en {timeframe} (histograma {histogram:.5f}).")
+            return "HOLD"
+    return signal
+
+def calculate_trailing_stop(state, current_price, notify=True):
+    """
+    Actualiza last_stop_price según el precio actual. Con notify=False (watcher
+    intrabar) no se envían alertas por cada ajuste del stop.
+    """
     if not state.get("position_open"):
         return state
 
@@ -308,7 +728,8 @@ def calculate_trailing_stop(state, current_price):
             logger.critical(f"🛑 STOP LOSS INICIAL ACTIVADO. Precio {current_price:.2f} < SL {initial_stop_safety:.2f}")
             state["trigger_exit"] = "STOP LOSS"
         
-        logger.info(f"Ganancia flotante ({profit_pct:.2%}) bajo el trigger ({MIN_PROFIT_TRIGGER:.2%}). SL no se mueve (último SL: {last_stop:.2f}).")
+        log = logger.info if notify else logger.debug
+        log(f"Ganancia flotante ({profit_pct:.2%}) bajo el trigger ({MIN_PROFIT_TRIGGER:.2%}). SL no se mueve (último SL: {last_stop:.2f}).")
         return state
 
     if new_stop_price > last_stop:
@@ -318,7 +739,8 @@ def calculate_trailing_stop(state, current_price):
                f"Ganancia Flotante: {profit_pct:.2%}\n"
                f"Nuevo Stop Loss: **{new_stop_price:.4f}**")
         
-        send_telegram_alert(msg)
+        if notify:
+            send_telegram_alert(msg)
         logger.info(msg)
         
     return state
@@ -327,17 +749,30 @@ def calculate_trailing_stop(state, current_price):
 # EJECUCIÓN DE ÓRDENES (REAL O STUB)
 # ============================================================
 def get_last_price(df):
-    """ Obtiene el precio de cierre reciente del DataFrame ya cargado. """
+    """ Obtiene el precio de cierre reciente del DataFrame o del motor de indicadores. """
     if df is None or len(df) == 0:
         logger.warning("No hay DataFrame para obtener el precio de cierre.")
         return 0.0
-    return float(df.iloc[-1]["Close"])
+    return float(latest_values(df)["Close"])
 
-def execute_real_trade(signal, symbol, qty, price, execution_type="Signal"):
+def close_position(state, qty, price, execution_type, signal_ts=None):
+    """ Cierra la posición abierta (SELL), registra PnL y limpia el estado. """
+    exit_price = execute_real_trade("SELL", SYMBOL, qty, price, execution_type=execution_type, signal_ts=signal_ts)
+    if exit_price > 0:
+        state = update_pnl_and_drawdown(state, state["entry_price"], exit_price, "SELL")
+        state["position_open"] = False
+        state["entry_price"] = 0.0
+        state["last_stop_price"] = 0.0
+        state["position_qty"] = 0.0
+    return state
+
+def execute_real_trade(signal, symbol, qty, price, execution_type="Signal", signal_ts=None):
     """
     Ejecuta una orden de trading real o simula si PAPER_TRADING_MODE es True.
-    Retorna el precio de ejecución real.
+    Retorna el precio de ejecución real (precio medio de llenado en modo REAL).
+    `signal_ts` (epoch) es el instante de la decisión, para medir señal→fill.
     """
+    signal_ts = signal_ts if signal_ts is not None else time.time()
     alert_emoji = "✅" if execution_type in ("Signal", "BUY") else "🛑"
     side = "buy" if signal == "BUY" else "sell"
     
@@ -355,19 +790,35 @@ def execute_real_trade(signal, symbol, qty, price, execution_type="Signal"):
     # MODO EJECUCIÓN REAL (CCXT)
     # ------------------------------------
     try:
+        ex = init_exchange()
         # Usamos orden de mercado para ejecución rápida
-        order = exchange.create_order(
+        submit_ts = time.time()
+        order = ex.create_order(
             symbol=symbol,
             type="market",
             side=side,
             amount=qty,
         )
-        # Extraer precio de ejecución (si no está disponible inmediatamente, usamos el precio de mercado)
-        exec_price = float(order.get("price", price))
-        
+        ack_ts = time.time()
+
+        # Kraken no devuelve el precio en la respuesta de create_order: se sigue
+        # la orden hasta el llenado para obtener el precio medio real.
+        tracker = ExecutionTracker(ex, stats_file=EXECUTION_STATS_FILE,
+                                   poll_interval=FILL_POLL_SECONDS, timeout=FILL_TIMEOUT_SECONDS)
+        fill = tracker.track(order, symbol, side, price, signal_ts, submit_ts, ack_ts)
+        exec_price = fill["fill_price"]
+        if exec_price is None:
+            logger.warning(f"Sin precio de llenado para la orden {order['id']}; se usa el precio de decisión.")
+            exec_price = price
+
+        slippage = f"{fill['slippage_bps']:.1f} bps" if fill["slippage_bps"] is not None else "N/D"
+        fees = ", ".join(f"{cost:.6f} {cur}" for cur, cost in fill["fees"].items()) or "N/D"
         log_msg = f"[{alert_emoji} REAL] 💰 ORDEN {signal} EXITOSA. Qty: {qty:.8f} @ {exec_price:.4f}. ID: {order['id']}"
         logger.critical(log_msg)
-        send_telegram_alert(f"{alert_emoji} **ORDEN REAL {signal} EJECUTADA**\nPrecio: **{exec_price:.4f}** | Qty: `{qty:.8f}`", chat_id=TELEGRAM_CHAT_ID)
+        send_telegram_alert(
+            f"{alert_emoji} **ORDEN REAL {signal} EJECUTADA**\nPrecio: **{exec_price:.4f}** | Qty: `{qty:.8f}`\n"
+            f"Slippage: `{slippage}` | Comisión: `{fees}` | Señal→Fill: `{fill['signal_to_fill_ms']:.0f} ms`",
+            chat_id=TELEGRAM_CHAT_ID)
         return exec_price
         
     except (ExchangeError, NetworkError) as e:
@@ -384,51 +835,88 @@ def execute_real_trade(signal, symbol, qty, price, execution_type="Signal"):
 # ============================================================
 # BLOQUE PRINCIPAL DE EJECUCIÓN
 # ============================================================
-if __name__ == "__main__":
-    
+def run_once(closed_candles_only=False):
+    """
+    Ejecuta un ciclo completo de decisión. Retorna el código de salida (0 = OK).
+    Con closed_candles_only=True se descarta la vela aún en formación.
+    El estado queda bloqueado durante el ciclo para no pisar al watcher.
+    """
+    with state_lock():
+        try:
+            return _run_cycle(closed_candles_only)
+        finally:
+            commit_state() # Una única escritura de estado por ciclo
+
+def _run_cycle(closed_candles_only):
     # ... (código de inicialización y logs) ...
     log_init_msg = f"Iniciando proceso para {SYMBOL} en timeframe {TIMEFRAME} con LIMIT={LIMIT}. Modo REAL: {not PAPER_TRADING_MODE}."
     logger.info(log_init_msg)
 
     state = load_state()
-    send_telegram_alert(f"⚙️ **INICIO DE EJECUCIÓN (1h)**\n{log_init_msg}", chat_id=TELEGRAM_LOGS_CHAT_ID)
+
+    # El cooldown se comprueba antes de tocar la red: salir aquí cuesta milisegundos.
+    if check_shutdown_and_drawdown(state):
+        logger.warning("Operación suspendida por políticas de riesgo/cooldown.")
+        return 0
+
+    if not confirm_timeframes_ok():
+        return 1
+
+    send_telegram_alert(f"⚙️ **INICIO DE EJECUCIÓN ({TIMEFRAME})**\n{log_init_msg}", chat_id=TELEGRAM_LOGS_CHAT_ID)
+    init_exchange()
 
     # ... (código de balance inicial y drawdown check) ...
     if state["initial_balance"] is None:
         bal_usd = fetch_total_balance_in_usd() 
         if bal_usd <= 0:
             logger.error("Error: Balance inicial no puede ser 0 después del simulado.")
-            raise SystemExit(1) 
+            return 1
         state["initial_balance"] = bal_usd
-        save_state(state)
+        save_state(state, "balance inicial")
         logger.info(f"Balance inicial establecido: {bal_usd:.2f} USD")
 
-    if check_shutdown_and_drawdown(state):
-        logger.warning("Operación suspendida por políticas de riesgo/cooldown.")
-        raise SystemExit(0)
+        if check_shutdown_and_drawdown(state):
+            logger.warning("Operación suspendida por políticas de riesgo/cooldown.")
+            return 0
 
     # ... (Obtener datos, calcular MACD y señal) ...
-    klines_data = get_historical_data(SYMBOL, timeframe=TIMEFRAME, limit=LIMIT)
+    if BASE_TIMEFRAME and not refresh_base_candles():
+        logger.error("Fallo en la conexión o datos vacíos recibidos de Kraken.")
+        return 1
+    if BASE_TIMEFRAME and not confirm_timeframes_ok(len(get_resampler())):
+        return 1
+    klines_data = get_candles(TIMEFRAME, LIMIT)
     if not klines_data or len(klines_data) == 0:
         logger.error("Fallo en la conexión o datos vacíos recibidos de Kraken.")
-        raise SystemExit(1)
+        return 1
+
+    if closed_candles_only:
+        klines_data = drop_open_candle(klines_data, TIMEFRAME)
+        if not klines_data:
+            logger.error("No hay velas cerradas disponibles.")
+            return 1
 
-    df_macd = calculate_macd(klines_data)
+    if INDICATOR_ENGINE == "pandas":
+        df_macd = calculate_macd(klines_data)
+    else:
+        df_macd = calculate_indicators(klines_data)
     if df_macd is None:
         logger.error("No se pudo calcular MACD.")
-        raise SystemExit(1)
+        return 1
 
     signal = generate_signal(df_macd)
+    signal_ts = time.time()
     price = get_last_price(df_macd)
     bal_usd = fetch_total_balance_in_usd()
     qty = compute_position_size(bal_usd, price) # Calcula MICRO_QTY si PAPER_TRADING_MODE=False
     
     # 2. Log detallado de la decisión (Canal privado)
-    last = df_macd.iloc[-1]
+    last = latest_values(df_macd)
     log_detail_msg = (
         f"📊 **LOG DETALLADO**\n"
-        f"MACD: `{last['MACD_12_26_9']:.5f}`\n"
-        f"Señal: `{last['MACDs_12_26_9']:.5f}`\n"
+        f"MACD: `{_fmt(last['MACD_12_26_9'])}`\n"
+        f"Señal: `{_fmt(last['MACDs_12_26_9'])}`\n"
+        f"RSI: `{_fmt(last.get('RSI_14'), 1)}` | ATR: `{_fmt(last.get('ATRr_14'))}`\n"
         f"Precio Actual: **{price:.4f} {SYMBOL.split('/')[1]}**\n"
         f"Decisión: **{signal}** | QTY: **{qty:.4f}**\n"
         f"Posición Abierta: `{state['position_open']}` | Entrada: `{state['entry_price']:.4f}`\n"
@@ -456,17 +944,11 @@ if __name__ == "__main__":
     # Cierre Forzado (SL o Trailing SL)
     if state["trigger_exit"]:
         # Se usa la cantidad previamente guardada en el estado
-        exit_price = execute_trade("SELL", SYMBOL, state.get("position_qty", qty), price, execution_type=state["trigger_exit"])
-        if exit_price > 0:
-            state = update_pnl_and_drawdown(state, state["entry_price"], exit_price, "SELL")
-            state["position_open"] = False
-            state["entry_price"] = 0.0
-            state["last_stop_price"] = 0.0
-            state["position_qty"] = 0.0
+        state = close_position(state, state.get("position_qty", qty), price, state["trigger_exit"], signal_ts)
     
     # Apertura
     elif signal == "BUY" and not state.get("position_open"):
-        exec_price = execute_trade(signal, SYMBOL, qty, price)
+        exec_price = execute_trade(signal, SYMBOL, qty, price, signal_ts=signal_ts)
         if exec_price > 0: 
             state["position_open"] = True
             state["entry_price"] = exec_price
@@ -476,13 +958,7 @@ if __name__ == "__main__":
     # Cierre por Señal Contraria (SELL sin cierre forzado)
     elif signal == "SELL" and state.get("position_open"):
         # Se usa la cantidad previamente guardada en el estado
-        exit_price = execute_trade("SELL", SYMBOL, state.get("position_qty", qty), price, execution_type="Signal")
-        if exit_price > 0: 
-            state = update_pnl_and_drawdown(state, state["entry_price"], exit_price, "SELL")
-            state["position_open"] = False
-            state["entry_price"] = 0.0
-            state["last_stop_price"] = 0.0
-            state["position_qty"] = 0.0
+        state = close_position(state, state.get("position_qty", qty), price, "Signal", signal_ts)
         
     # HOLD
     else:
@@ -490,11 +966,195 @@ if __name__ == "__main__":
 
 
     # 5. Guardar Estado y Finalizar
-    save_state(state)
+    save_state(state, f"fin de ciclo ({signal})")
 
     if check_shutdown_and_drawdown(state):
         msg = f"Bot entra en cooldown por drawdown tras última decisión: {signal}"
         logger.warning(msg)
         send_telegram_alert(f"⚠️ {msg}")
     
+    logger.info(f"Uso de la API de Kraken en el ciclo: {exchange.stats()}")
     send_telegram_alert(f"🏁 **FIN DE EJECUCIÓN**", chat_id=TELEGRAM_LOGS_CHAT_ID)
+    return 0
+
+# ============================================================
+# WATCHER INTRABAR DEL TRAILING STOP
+# ============================================================
+_price_session = None
+
+def fetch_live_price(symbol):
+    """
+    Precio actual del par. Si PRICE_FEED_URL está definido se sondea ese endpoint
+    (formato Ticker de Kraken: result -> par -> c[0]); si no, exchange.fetch_ticker.
+    """
+    global _price_session
+    if PRICE_FEED_URL:
+        if _price_session is None:
+            _price_session = requests.Session()
+        resp = _price_session.get(PRICE_FEED_URL, timeout=5)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("error"):
+            raise ValueError(f"Error del feed de precios: {data['error']}")
+        ticker = next(iter(data["result"].values()))
+        return float(ticker["c"][0])
+
+    ticker = get_market_data().get(
+        ticker_key(symbol), CACHE_TTL_TICKER,
+        lambda: snapshot_from_ccxt_ticker(init_exchange().fetch_ticker(symbol)),
+    )
+    return float(ticker["last"])
+
+def check_intrabar_stop(price):
+    """
+    Evalúa el trailing stop con el precio intrabar: actualiza last_stop_price y,
+    si el precio perfora el stop, cierra la posición con execute_real_trade.
+    Lee y guarda el mismo archivo de estado bajo state_lock().
+    """
+    with state_lock():
+        state = load_state()
+        if not state.get("position_open"):
+            return state
+
+        before = dict(state)
+        state["trigger_exit"] = None
+        state = calculate_trailing_stop(state, price, notify=False)
+
+        last_stop = state["last_stop_price"]
+        if price < last_stop and last_stop > 0:
+            logger.critical(f"🛑 TRAILING STOP INTRABAR. Precio {price:.4f} < SL {last_stop:.4f}")
+            state["trigger_exit"] = "TRAILING SL"
+
+        if state["trigger_exit"]:
+            state = close_position(state, state.get("position_qty", MICRO_QTY), price,
+                                   f"{state['trigger_exit']} (INTRABAR)")
+        state["trigger_exit"] = None
+
+        if state != before:
+            save_state(state, "watcher intrabar")
+            commit_state()
+        return state
+
+def run_stop_watcher(stop_event=None):
+    """
+    Bucle del watcher: cada WATCH_INTERVAL_SECONDS, si hay posición abierta,
+    consulta el precio y aplica check_intrabar_stop. Sin posición no hay red.
+    """
+    stop_event = stop_event or threading.Event()
+    logger.info(f"Watcher de trailing stop activo para {SYMBOL} (cada {WATCH_INTERVAL_SECONDS:.1f}s).")
+    while not stop_event.is_set():
+        try:
+            if load_state().get("position_open"):
+                check_intrabar_stop(fetch_live_price(SYMBOL))
+        except Exception as e:
+            logger.warning(f"Watcher de trailing stop: error en el sondeo: {e}")
+        stop_event.wait(WATCH_INTERVAL_SECONDS)
+
+# ============================================================
+# MODO RESIDENTE (DAEMON) ALINEADO AL CIERRE DE VELA
+# ============================================================
+_env_file_mtime = None
+
+def reload_env_file():
+    """
+    Si BOT_ENV_FILE existe y cambió desde la última lectura, aplica sus pares
+    KEY=VALUE sobre el entorno y recarga la configuración sin reiniciar.
+    """
+    global _env_file_mtime, exchange
+    if not BOT_ENV_FILE:
+        return False
+    try:
+        mtime = os.path.getmtime(BOT_ENV_FILE)
+    except OSError:
+        return False
+    if mtime == _env_file_mtime:
+        return False
+
+    try:
+        with open(BOT_ENV_FILE, "r") as f:
+            lines = f.read().splitlines()
+    except Exception as e:
+        logger.warning(f"No se pudo leer {BOT_ENV_FILE}: {e}")
+        return False
+    _env_file_mtime = mtime
+
+    changed = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        key = key.strip()
+        value = value.strip().strip('"').strip("'")
+        if os.environ.get(key) != value:
+            os.environ[key] = value
+            changed.append(key)
+
+    if not changed:
+        return False
+
+    old_credentials = (API_KEY, SECRET_KEY)
+    load_config()
+    if exchange is not None and (API_KEY, SECRET_KEY) != old_credentials:
+        exchange = None # Se recrea en el próximo ciclo (mercados desde caché)
+    logger.info(f"Configuración recargada desde {BOT_ENV_FILE}: {', '.join(sorted(changed))}")
+    return True
+
+def timeframe_seconds(timeframe):
+    """ Duración de una vela en segundos (ej: '1h' -> 3600). """
+    return ccxt.Exchange.parse_timeframe(timeframe)
+
+def drop_open_candle(klines_data, timeframe, now=None):
+    """ Descarta las velas que aún no han cerrado (timestamp + duración > ahora). """
+    now_ms = (now if now is not None else time.time()) * 1000
+    tf_ms = timeframe_seconds(timeframe) * 1000
+    return [k for k in klines_data if k[0] + tf_ms <= now_ms]
+
+def seconds_until_next_close(timeframe, offset_seconds, now=None):
+    """ Segundos hasta el próximo cierre de vela de `timeframe` más el offset. """
+    now = now if now is not None else time.time()
+    tf = timeframe_seconds(timeframe)
+    next_close = (now // tf + 1) * tf
+    return max(0.0, next_close + offset_seconds - now)
+
+def run_daemon():
+    """
+    Proceso residente: despierta justo después de cada cierre de vela de
+    TIMEFRAME (+ CANDLE_CLOSE_OFFSET_SECONDS) y ejecuta un ciclo sólo con velas
+    cerradas. El exchange y la caché de mercados se mantienen en memoria.
+    """
+    logger.info(f"Modo daemon activo para {SYMBOL} ({TIMEFRAME}, offset {CANDLE_CLOSE_OFFSET_SECONDS:.0f}s).")
+    reload_env_file()
+    if STOP_WATCHER:
+        threading.Thread(target=run_stop_watcher, name="stop-watcher", daemon=True).start()
+    while True:
+        wait = seconds_until_next_close(TIMEFRAME, CANDLE_CLOSE_OFFSET_SECONDS)
+        logger.info(f"Próximo ciclo en {wait:.0f}s.")
+        time.sleep(wait)
+
+        reload_env_file()
+        try:
+            run_once(closed_candles_only=True)
+        except (Exception, SystemExit) as e:
+            # Un ciclo fallido no debe tumbar el daemon; se reintenta en la próxima vela.
+            logger.error(f"Ciclo fallido en modo daemon: {e}")
+            traceback.print_exc()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bot de trading MACD para Kraken.")
+    parser.add_argument("--daemon", action="store_true",
+                        default=os.getenv("DAEMON_MODE", "False").lower() == "true",
+                        help="Proceso residente alineado al cierre de cada vela (o DAEMON_MODE=True).")
+    parser.add_argument("--watch", action="store_true",
+                        help="Sólo el watcher intrabar del trailing stop (junto a ejecuciones por cron).")
+    args = parser.parse_args()
+
+    if args.daemon or args.watch:
+        try:
+            run_daemon() if args.daemon else run_stop_watcher()
+        except KeyboardInterrupt:
+            logger.info("Proceso residente detenido por el usuario.")
+    else:
+        raise SystemExit(run_once())
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import fcntl
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CACHÉ LOCAL DE DATOS DE MERCADO COMPARTIDA ENTRE BOTS
+# ============================================================
+# bot_noticias.py (httpx, Ticker REST de Kraken) y macd_trader.py (ccxt) leen
+# de este directorio antes de ir a la red. Cada clave (ticker o velas de un par)
+# es un archivo JSON con metadatos de frescura:
+#   {"fetched_at": epoch, "source": "macd_trader", "data": ...}
+# Las escrituras son atómicas (tmp + rename), así que la lectura no necesita
+# lock. El refresco se serializa con flock sobre <clave>.lock: si varios
+# procesos encuentran el dato vencido a la vez, sólo uno consulta el exchange
+# y los demás leen lo que dejó escrito.
+
+DEFAULT_DIR = "market_data"
+
+
+def ticker_key(symbol):
+    return f"ticker_{symbol.replace('/', '-')}"
+
+
+def ohlcv_key(symbol, timeframe):
+    return f"ohlcv_{symbol.replace('/', '-')}_{timeframe}"
+
+
+def snapshot_from_kraken_ticker(ticker, symbol):
+    """ Normaliza una entrada del endpoint público Ticker de Kraken. """
+    return {
+        "symbol": symbol,
+        "last": float(ticker["c"][0]),
+        "open": float(ticker["o"]),
+        "high": float(ticker["h"][1]),
+        "low": float(ticker["l"][1]),
+        "bid": float(ticker["b"][0]),
+        "ask": float(ticker["a"][0]),
+        "volume": float(ticker["v"][1]),
+        "timestamp": int(time.time() * 1000),
+    }
+
+
+def snapshot_from_ccxt_ticker(ticker):
+    """ Normaliza un ticker unificado de ccxt al mismo formato. """
+    keys = ("last", "open", "high", "low", "bid", "ask")
+    snapshot = {k: float(ticker[k]) if ticker.get(k) is not None else None for k in keys}
+    snapshot["symbol"] = ticker.get("symbol")
+    snapshot["volume"] = ticker.get("baseVolume")
+    snapshot["timestamp"] = ticker.get("timestamp") or int(time.time() * 1000)
+    return snapshot
+
+
+class MarketDataCache:
+    """ Caché en disco de tickers y velas con frescura y refresco único entre procesos. """
+
+    def __init__(self, directory=DEFAULT_DIR, source="unknown"):
+        self.directory = directory
+        self.source = source
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def read(self, key):
+        """ Entrada completa {fetched_at, source, data} o None si no existe/ilegible. """
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada de caché de mercado ilegible ({key}): {e}")
+            return None
+
+    def write(self, key, data):
+        entry = {"fetched_at": time.time(), "source": self.source, "data": data}
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+        return entry
+
+    @staticmethod
+    def is_fresh(entry, max_age, min_fetched_at=None, accept=None):
+        if entry is None:
+            return False
+        if time.time() - entry["fetched_at"] > max_age:
+            return False
+        if min_fetched_at is not None and entry["fetched_at"] < min_fetched_at:
+            return False
+        return accept is None or accept(entry["data"])
+
+    def get(self, key, max_age, fetch, min_fetched_at=None, accept=None):
+        """
+        Retorna el dato de `key` si es fresco; si no, lo refresca con fetch()
+        (una sola vez entre todos los procesos) y lo guarda.
+        `min_fetched_at` exige que se haya obtenido después de ese instante
+        (ej: cierre de la última vela) y `accept(data)` valida el contenido.
+        """
+        entry = self.read(key)
+        if self.is_fresh(entry, max_age, min_fetched_at, accept):
+            logger.debug(f"Caché de mercado: {key} servido desde disco ({entry['source']}).")
+            return entry["data"]
+
+        with open(f"{self._path(key)}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Otro proceso pudo refrescar mientras esperábamos el lock.
+                entry = self.read(key)
+                if self.is_fresh(entry, max_age, min_fetched_at, accept):
+                    return entry["data"]
+                return self.write(key, fetch())["data"]
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def aget(self, key, max_age, afetch, min_fetched_at=None, accept=None, poll=0.05):
+        """ Versión asíncrona de get(): `afetch` es una corrutina y el lock no bloquea el loop. """
+        entry = self.read(key)
+        if self.is_fresh(entry, max_age, min_fetched_at, accept):
+            logger.debug(f"Caché de mercado: {key} servido desde disco ({entry['source']}).")
+            return entry["data"]
+
+        with open(f"{self._path(key)}.lock", "a") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(poll)
+            try:
+                entry = self.read(key)
+                if self.is_fresh(entry, max_age, min_fetched_at, accept):
+                    return entry["data"]
+                return self.write(key, await afetch())["data"]
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
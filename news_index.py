@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from news_scoring import score_headline
+
+# ==============================================================================
+# ÍNDICE INVERTIDO SOBRE EL ARCHIVO DE NOTICIAS (NewsTable)
+# ==============================================================================
+# token -> postings ordenadas por timestamp (dos listas paralelas: ts y doc_id).
+# Una consulta por palabra clave + rango temporal es un bisect por token y una
+# intersección empezando por la lista más corta, sin recorrer la tabla TinyDB.
+# El índice se mantiene incrementalmente (add al insertar, prune al aplicar la
+# retención de clean_old_news) y se persiste en JSON junto a la base de datos;
+# sync() incorpora los documentos con doc_id mayor que la última marca indexada.
+
+TOKEN_RE = re.compile(r"\w+")
+ALL = "*" # Postings de todos los documentos (consultas sin palabras clave)
+CATEGORY_PREFIX = "#cat:" # Postings por categoría (se intersectan como un token más)
+INDEX_VERSION = 2 # v1 guardaba score 0 para los registros antiguos sin 'score'
+
+
+def normalize(text: str) -> str:
+    """ Minúsculas y sin acentos: 'Interés' -> 'interes'. """
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(normalize(text))
+
+
+def _to_epoch(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+class NewsIndex:
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.watermark = 0
+        self.docs = {} # doc_id -> [ts, categoría, score, titular, titular_normalizado]
+        self.postings = {} # token -> [lista_ts, lista_doc_id]
+        self.headlines = {} # titular -> doc_id (dedup exacto en O(1))
+
+    # --------------------------------------------------------------------------
+    # Mantenimiento
+    # --------------------------------------------------------------------------
+    def add(self, doc_id: int, record: dict) -> None:
+        if doc_id in self.docs:
+            return
+        ts = _to_epoch(record['timestamp'])
+        category = record.get('category', 'GENERAL')
+        tokens = tokenize(record['headline'])
+        score = record.get('score')
+        if score is None: # Registros anteriores a que se guardara el score
+            score, _ = score_headline(record['headline'].lower())
+        self.docs[doc_id] = [ts, category, score,
+                             record['headline'], " ".join(tokens)]
+        self.headlines[record['headline']] = doc_id
+        for token in set(tokens) | {ALL, CATEGORY_PREFIX + category}:
+            ts_list, id_list = self.postings.setdefault(token, [[], []])
+            if not ts_list or ts >= ts_list[-1]:
+                ts_list.append(ts) # Caso habitual: el documento más reciente
+                id_list.append(doc_id)
+            else:
+                pos = bisect_right(ts_list, ts)
+                ts_list.insert(pos, ts)
+                id_list.insert(pos, doc_id)
+        self.watermark = max(self.watermark, doc_id)
+
+    def sync(self, table) -> int:
+        """ Indexa los documentos de la tabla posteriores a la marca. Retorna cuántos. """
+        added = 0
+        for doc in table:
+            if doc.doc_id > self.watermark:
+                self.add(doc.doc_id, doc)
+                added += 1
+        return added
+
+    def prune(self, cutoff: datetime) -> int:
+        """ Elimina del índice lo anterior a `cutoff` (misma retención que NewsTable). """
+        cutoff_ts = cutoff.timestamp()
+        removed = [doc_id for doc_id, doc in self.docs.items() if doc[0] < cutoff_ts]
+        for doc_id in removed:
+            headline = self.docs.pop(doc_id)[3]
+            if self.headlines.get(headline) == doc_id:
+                del self.headlines[headline]
+        for token in list(self.postings):
+            ts_list, id_list = self.postings[token]
+            cut = bisect_left(ts_list, cutoff_ts)
+            if cut == len(ts_list):
+                del self.postings[token]
+            elif cut:
+                del ts_list[:cut]
+                del id_list[:cut]
+        return len(removed)
+
+    def contains(self, headline: str) -> bool:
+        return headline in self.headlines
+
+    # --------------------------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------------------------
+    def _has(self, token, doc_id):
+        """ ¿La postings de `token` contiene doc_id? Bisect por su timestamp. """
+        ts_list, id_list = self.postings.get(token, ([], []))
+        ts = self.docs[doc_id][0]
+        pos = bisect_left(ts_list, ts)
+        while pos < len(ts_list) and ts_list[pos] == ts:
+            if id_list[pos] == doc_id:
+                return True
+            pos += 1
+        return False
+
+    def _range(self, token, since_ts, until_ts):
+        ts_list, id_list = self.postings.get(token, ([], []))
+        lo = bisect_left(ts_list, since_ts) if since_ts is not None else 0
+        hi = bisect_right(ts_list, until_ts) if until_ts is not None else len(ts_list)
+        return id_list[lo:hi]
+
+    def search(self, query: str = "", category: str = None, since: datetime = None,
+               until: datetime = None, limit: int = 20) -> dict:
+        """
+        Titulares que contienen `query` (frase, sin distinguir acentos) en el rango
+        temporal y la categoría dados, más agregados de sentimiento del resultado.
+        """
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+        query_tokens = tokenize(query)
+        tokens = list(dict.fromkeys(query_tokens)) or [ALL]
+        if category:
+            tokens.append(CATEGORY_PREFIX + category)
+
+        # Se recorre sólo la postings más corta; el resto se verifica por bisect.
+        tokens.sort(key=lambda t: len(self.postings.get(t, ([], []))[0]))
+        matches = self._range(tokens[0], since_ts, until_ts)
+        for token in tokens[1:]:
+            matches = [doc_id for doc_id in matches if self._has(token, doc_id)]
+
+        if len(query_tokens) > 1:
+            phrase = " ".join(query_tokens)
+            # Con espacios en los extremos: la frase debe coincidir en límites de token.
+            matches = [doc_id for doc_id in matches if f" {phrase} " in f" {self.docs[doc_id][4]} "]
+
+        scores = []
+        by_category = {}
+        for doc_id in matches:
+            _, doc_category, score = self.docs[doc_id][:3]
+            scores.append(score)
+            agg = by_category.setdefault(doc_category, {"count": 0, "score": 0})
+            agg["count"] += 1
+            agg["score"] += score
+
+        newest = matches[::-1][:limit] if limit else matches[::-1]
+        results = []
+        for doc_id in newest:
+            ts, doc_category, score, headline = self.docs[doc_id][:4]
+            results.append({"doc_id": doc_id, "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                            "category": doc_category, "score": score, "headline": headline})
+        return {
+            "count": len(matches),
+            "sentiment": {
+                "total": sum(scores),
+                "mean": sum(scores) / len(scores) if scores else 0.0,
+                "positive": sum(1 for s in scores if s > 0),
+                "negative": sum(1 for s in scores if s < 0),
+                "neutral": sum(1 for s in scores if s == 0),
+                "by_category": by_category,
+            },
+            "results": results,
+        }
+
+    # --------------------------------------------------------------------------
+    # Persistencia
+    # --------------------------------------------------------------------------
+    @classmethod
+    def load(cls, path: str) -> "NewsIndex":
+        index = cls(path)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return index
+        except Exception as e:
+            print(f"DEBUG INDEX: Índice ilegible ({e}); se reconstruirá desde la DB.")
+            return index
+        if data.get('version') != INDEX_VERSION:
+            print("DEBUG INDEX: Índice de una versión anterior; se reconstruirá desde la DB.")
+            return index
+        index.watermark = data['watermark']
+        index.docs = {int(k): v for k, v in data['docs'].items()}
+        index.postings = data['postings']
+        index.headlines = {doc[3]: doc_id for doc_id, doc in index.docs.items()}
+        return index
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "watermark": self.watermark, "docs": self.docs,
+                       "postings": self.postings}, f)
+        os.replace(tmp_path, self.path)
+
+
+if __name__ == '__main__':
+    import argparse
+    from tinydb import TinyDB
+
+    parser = argparse.ArgumentParser(description="Búsqueda en el archivo de noticias.")
+    parser.add_argument('query', nargs='?', default="", help="Palabras clave o frase (ej: 'banco central').")
+    parser.add_argument('--db', default='db.json', help="Ruta de la base TinyDB.")
+    parser.add_argument('--index', help="Ruta del índice (por defecto <db>.index.json).")
+    parser.add_argument('--category', help="ECONOMIA, TECNOLOGIA, DATA/AUTO o GENERAL.")
+    parser.add_argument('--days', type=float, help="Sólo los últimos N días.")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    index = NewsIndex.load(args.index or f"{args.db}.index.json")
+    if index.sync(TinyDB(args.db).table('news')):
+        index.save()
+
+    start = time.perf_counter()
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    result = index.search(args.query, category=args.category, since=since, limit=args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    sentiment = result['sentiment']
+    print(f"{result['count']} titulares ({elapsed_ms:.3f} ms) | sentimiento total {sentiment['total']} "
+          f"(media {sentiment['mean']:.2f}; +{sentiment['positive']} / -{sentiment['negative']} / ={sentiment['neutral']})")
+    for cat, agg in sentiment['by_category'].items():
+        print(f"  [{cat}] {agg['count']} titulares, score {agg['score']}")
+    for r in result['results']:
+        print(f"{r['timestamp'][:16]} [{r['category']}] ({r['score']:+d}) {r['headline']}")
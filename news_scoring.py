@@ -0,0 +1,80 @@
+# ==============================================================================
+# CATEGORIZACIÓN Y SENTIMIENTO DE TITULARES
+# ==============================================================================
+# Compartido por bot_noticias.py y los workers de ingesta (news_workers.py).
+
+# Palabras clave para categorizar la noticia por tema (Data Automation, Economía, Tech)
+THEME_KEYWORDS = {
+    "ECONOMIA": [
+        "interés", "reservas", "inflación", "banco central", "recorte",
+        "inversión", "pública", "privada", "fmi", "opec", "ceo", "mercado"
+    ],
+    "TECNOLOGIA": [
+        "IA", "LLM", "cloud", "automatización", "5G", "algoritmo",
+        "machine learning", "quantum", "openai", "google", "microsoft"
+    ],
+    "DATA/AUTO": [
+        "data pipeline", "ETL", "airflow", "kubernetes", "sql", "databricks",
+        "snowflake", "big data", "automatización", "python"
+    ]
+}
+
+# Definición de pesos para el sentimiento (EXISTENTE)
+POSITIVE_KEYWORDS = {
+    # ... (Tu diccionario POSITIVE_KEYWORDS existente) ...
+    "sube": 1,
+    "ganancia": 1,
+    "recuperación": 1,
+    "aumenta": 1,
+    "supera": 1,
+    "récord": 2,
+    "máximos": 2,
+    "disparo": 2,
+    "explota": 2,
+    "rompe": 2,
+    "adopción": 2
+}
+NEGATIVE_KEYWORDS = {
+    # ... (Tu diccionario NEGATIVE_KEYWORDS existente) ...
+    "cae": -1,
+    "pérdida": -1,
+    "baja": -1,
+    "colapso": -2,
+    "caída libre": -2,
+    "desplome": -2,
+    "crisis": -2,
+    "liquida": -2
+}
+
+
+def categorize_headline(headline_lower: str) -> str:
+    """ Primera categoría temática cuyo keyword aparece en el titular. """
+    for cat_name, keywords in THEME_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in headline_lower:
+                return cat_name
+    return "GENERAL"
+
+
+def score_headline(headline_lower: str) -> tuple:
+    """ Score de sentimiento por pesos de keywords y su sugerencia para el reporte. """
+    score = 0
+    for keyword, weight in POSITIVE_KEYWORDS.items():
+        if keyword in headline_lower:
+            score += weight
+
+    for keyword, weight in NEGATIVE_KEYWORDS.items():
+        if keyword in headline_lower:
+            score += weight
+
+    # Asignación de la sugerencia (output para el usuario final)
+    sugerencia = "📊 Consolidación."
+    if score >= 2:
+        sugerencia = "🟢 Fuerte Alcista."
+    elif score == 1:
+        sugerencia = "📈 Alcista."
+    elif score <= -2:
+        sugerencia = "🔴 Fuerte Bajista."
+    elif score == -1:
+        sugerencia = "📉 Bajista."
+    return score, sugerencia
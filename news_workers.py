@@ -0,0 +1,318 @@
+import os
+import sys
+import time
+import socket
+import sqlite3
+import asyncio
+import argparse
+import multiprocessing
+from datetime import datetime
+
+import httpx
+import toml
+
+from news_scoring import categorize_headline, score_headline
+from rss_parser import parse_feed
+
+# ==============================================================================
+# INGESTA DE NOTICIAS EN VARIOS WORKERS CON LEASING DE FEEDS
+# ==============================================================================
+# Los workers (procesos en uno o varios nodos que comparten el archivo SQLite)
+# reclaman feeds mediante leases con vencimiento: un feed está disponible si le
+# toca (next_due) y nadie tiene un lease vigente. El reclamo es un UPDATE dentro
+# de una transacción BEGIN IMMEDIATE, así que dos workers nunca obtienen el mismo
+# feed. Cada worker descarga, parsea y puntúa sus feeds por su cuenta y escribe
+# en la tabla `news` con INSERT OR IGNORE (dedup atómico por titular). El lease
+# no se renueva: si un worker cae, vence y el feed vuelve a repartirse solo, pero
+# un proceso de feed que tarde más de `lease_seconds` también puede ser reclamado
+# por otro worker (lease_seconds debe superar holgadamente api_timeout). Los
+# feeds que desaparecen de config.toml se borran de la tabla al arrancar un worker.
+#
+# El reporte se arma en un paso separado (comando `report`), que toma las
+# noticias nuevas desde el último reporte, las archiva en TinyDB/índice y envía
+# el reporte de Telegram con la lógica de bot_noticias.py.
+#
+# Nodos distintos pueden compartir el archivo en un sistema de archivos de red
+# con locks POSIX fiables (en montajes NFS antiguos no). Por eso el modo por
+# defecto es el journal de rollback (journal_mode = "DELETE"): WAL necesita
+# memoria compartida entre los procesos y sólo es válido si todos los workers
+# corren en el mismo host. La tabla `news` aplica la misma retención que
+# clean_old_news (7 días por defecto): pasado ese plazo un titular puede volver
+# a ingresarse.
+
+PRUNE_INTERVAL = 3600 # Segundos entre purgas de retención en cada worker
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    url TEXT PRIMARY KEY,
+    lease_owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    next_due REAL NOT NULL DEFAULT 0,
+    last_ok REAL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    headline TEXT NOT NULL UNIQUE,
+    link TEXT,
+    category TEXT,
+    score INTEGER,
+    sugerencia TEXT,
+    feed TEXT,
+    worker TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS news_ts ON news(ts);
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    last_news_id INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def load_settings() -> dict:
+    with open('config.toml', 'r') as f:
+        config = toml.load(f)
+    workers = config.get('workers', {})
+    return {
+        "rss_urls": config['rss']['urls'],
+        "max_entries": config['rss'].get('max_entries'),
+        "api_timeout": config['api']['api_timeout'],
+        "store_path": workers.get('store_path', 'news_shared.db'),
+        "lease_seconds": workers.get('lease_seconds', 120),
+        "fetch_interval": workers.get('fetch_interval', 300),
+        "journal_mode": workers.get('journal_mode', 'DELETE').upper(),
+        "retention_days": workers.get('retention_days', 7),
+    }
+
+
+def connect(store_path: str, journal_mode: str = "DELETE") -> sqlite3.Connection:
+    """ journal_mode "DELETE" para nodos que comparten el archivo; "WAL" sólo en un único host. """
+    if journal_mode not in ("DELETE", "WAL"):
+        raise ValueError(f"journal_mode no soportado: {journal_mode}")
+    conn = sqlite3.connect(store_path, timeout=30, isolation_level=None)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    if journal_mode == "WAL":
+        conn.execute("PRAGMA synchronous=NORMAL")
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(news)")]
+    if columns and "id" not in columns:
+        raise RuntimeError(f"{store_path} tiene el esquema anterior (sin news.id); bórrelo para recrearlo.")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def register_feeds(conn: sqlite3.Connection, urls: list) -> int:
+    """ Sincroniza la tabla con la lista de config.toml. Retorna cuántos feeds se quitaron. """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("INSERT OR IGNORE INTO feeds(url) VALUES (?)", [(u,) for u in urls])
+        placeholders = ", ".join("?" * len(urls))
+        removed = conn.execute(f"DELETE FROM feeds WHERE url NOT IN ({placeholders})", urls).rowcount
+        conn.execute("COMMIT")
+        return removed
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# ------------------------------------------------------------------------------
+# Leasing
+# ------------------------------------------------------------------------------
+def claim_feed(conn: sqlite3.Connection, worker_id: str, lease_seconds: float):
+    """ Reclama atómicamente un feed vencido y libre. Retorna su URL o None. """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT url FROM feeds WHERE next_due <= ? AND lease_until <= ? "
+            "ORDER BY next_due LIMIT 1", (now, now)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("UPDATE feeds SET lease_owner = ?, lease_until = ? WHERE url = ?",
+                     (worker_id, now + lease_seconds, row[0]))
+        conn.execute("COMMIT")
+        return row[0]
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def release_feed(conn: sqlite3.Connection, url: str, worker_id: str,
+                 fetch_interval: float, error: str = None) -> None:
+    """ Libera el lease (sólo si sigue siendo nuestro) y agenda el próximo turno. """
+    now = time.time()
+    conn.execute(
+        "UPDATE feeds SET lease_owner = NULL, lease_until = 0, next_due = ?, "
+        "last_ok = CASE WHEN ? IS NULL THEN ? ELSE last_ok END, last_error = ? "
+        "WHERE url = ? AND lease_owner = ?",
+        (now + fetch_interval, error, now, error, url, worker_id))
+
+
+def prune_news(conn: sqlite3.Connection, days: float) -> int:
+    """ Borra los titulares de más de `days` días (misma retención que clean_old_news). """
+    cursor = conn.execute("DELETE FROM news WHERE ts < ?", (time.time() - days * 86400,))
+    return cursor.rowcount
+
+
+def seconds_until_next_feed(conn: sqlite3.Connection) -> float:
+    row = conn.execute("SELECT MIN(MAX(next_due, lease_until)) FROM feeds").fetchone()
+    return max(0.0, (row[0] or time.time()) - time.time())
+
+
+# ------------------------------------------------------------------------------
+# Worker
+# ------------------------------------------------------------------------------
+def process_feed(conn: sqlite3.Connection, client: httpx.Client, url: str,
+                 worker_id: str, settings: dict) -> int:
+    """ Descarga, parsea y puntúa un feed; inserta sus titulares nuevos. Retorna cuántos. """
+    response = client.get(url, timeout=settings['api_timeout'])
+    response.raise_for_status()
+    entries = parse_feed(response.content, max_entries=settings['max_entries'])
+
+    now = time.time()
+    rows = []
+    for entry in entries:
+        headline_lower = entry.title.lower()
+        score, sugerencia = score_headline(headline_lower)
+        rows.append((entry.title, entry.link, categorize_headline(headline_lower),
+                     score, sugerencia, url, worker_id, now))
+
+    conn.execute("BEGIN IMMEDIATE")
+    before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO news(headline, link, category, score, sugerencia, feed, worker, ts) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("COMMIT")
+    return conn.total_changes - before
+
+
+def run_worker(worker_id: str, settings: dict, once: bool = False) -> None:
+    conn = connect(settings['store_path'], settings['journal_mode'])
+    removed = register_feeds(conn, settings['rss_urls'])
+    if removed:
+        print(f"DEBUG WORKER {worker_id}: {removed} feeds retirados de config.toml eliminados.")
+    if settings['api_timeout'] >= settings['lease_seconds']:
+        print(f"DEBUG WORKER {worker_id}: AVISO api_timeout ({settings['api_timeout']}s) >= lease_seconds "
+              f"({settings['lease_seconds']}s); un feed lento puede procesarse dos veces.")
+    processed = 0
+    last_prune = 0.0
+
+    with httpx.Client(follow_redirects=True) as client:
+        while True:
+            url = claim_feed(conn, worker_id, settings['lease_seconds'])
+            if url is None:
+                if time.time() - last_prune >= PRUNE_INTERVAL:
+                    removed = prune_news(conn, settings['retention_days'])
+                    last_prune = time.time()
+                    if removed:
+                        print(f"DEBUG WORKER {worker_id}: {removed} titulares antiguos eliminados.")
+                if once:
+                    break
+                time.sleep(min(seconds_until_next_feed(conn), 30) or 1)
+                continue
+
+            start = time.perf_counter()
+            try:
+                inserted = process_feed(conn, client, url, worker_id, settings)
+                release_feed(conn, url, worker_id, settings['fetch_interval'])
+                processed += 1
+                print(f"DEBUG WORKER {worker_id}: {url} -> {inserted} nuevas "
+                      f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+            except Exception as e:
+                release_feed(conn, url, worker_id, settings['fetch_interval'], error=str(e))
+                print(f"DEBUG WORKER {worker_id}: ERROR en {url}: {e}")
+
+    print(f"DEBUG WORKER {worker_id}: sin feeds pendientes, {processed} procesados.")
+    conn.close()
+
+
+# ------------------------------------------------------------------------------
+# Reporte (paso separado)
+# ------------------------------------------------------------------------------
+def collect_report(conn: sqlite3.Connection) -> tuple:
+    """
+    Noticias desde el último reporte con el formato de get_market_sentiment_and_news_rss.
+    La marca es el id de inserción, no la hora del worker: los ids se asignan al
+    escribir (los escritores están serializados), así que una fila confirmada
+    después de un reporte siempre tiene un id mayor que su marca.
+    """
+    row = conn.execute("SELECT MAX(last_news_id) FROM reports").fetchone()
+    since_id = row[0] or 0
+    rows = conn.execute(
+        "SELECT id, headline, link, category, score, sugerencia, ts FROM news "
+        "WHERE id > ? ORDER BY id", (since_id,)).fetchall()
+    last_id = rows[-1][0] if rows else since_id
+    rows = [r[1:] for r in rows]
+
+    news_report_list = [
+        {"titular": h, "link": link, "sugerencia": sug, "categoria": cat}
+        for h, link, cat, _, sug, _ in rows if cat != "GENERAL"
+    ][:5]
+    report = {
+        "status": "OK" if news_report_list else "ALERTA: RSS sin noticias nuevas *relevantes* disponibles.",
+        "reportes": news_report_list,
+        "sentiment_score": sum(r[3] for r in rows) if news_report_list else 0,
+        "timestamp": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+    }
+    return report, rows, last_id
+
+
+async def send_report(settings: dict) -> None:
+    import telegram
+    import bot_noticias as bot
+
+    conn = connect(settings['store_path'], settings['journal_mode'])
+    prune_news(conn, settings['retention_days'])
+    report, rows, last_id = collect_report(conn)
+
+    # Archivo histórico e índice de búsqueda (escritor único: este paso).
+    bot.clean_old_news()
+    bot.NewsIdx.sync(bot.NewsTable)
+    for headline, _, category, score, _, ts in rows:
+        if bot.NewsIdx.contains(headline):
+            continue
+        record = {'headline': headline, 'category': category, 'score': score,
+                  'timestamp': datetime.fromtimestamp(ts).isoformat()}
+        bot.NewsIdx.add(bot.NewsTable.insert(record), record)
+    bot.NewsIdx.save()
+
+    async with httpx.AsyncClient() as client:
+        crypto = await bot.get_crypto_metrics_via_api(client)
+    reporte_final = {**report, **crypto}
+    image_prompt = bot.generate_dynamic_tradingview_prompt(
+        reporte_final.get('btc_price_display', 'N/D'),
+        reporte_final.get('btc_price_clean_str', 'N/D'),
+        reporte_final.get('sentiment_score', 0))
+    await bot.format_and_send_trading_report(reporte_final, telegram.Bot(token=bot.BOT_TOKEN),
+                                             bot.CHAT_ID, bot.ADMIN_WHATSAPP_PHONE, image_prompt)
+
+    conn.execute("INSERT INTO reports(last_news_id, created) VALUES (?, ?)", (last_id, time.time()))
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Reporte enviado con {len(rows)} titulares nuevos.")
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingesta de noticias con workers y leasing de feeds.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    worker = sub.add_parser('worker', help="Procesa feeds reclamando leases.")
+    worker.add_argument('--processes', type=int, default=1, help="Workers en este nodo.")
+    worker.add_argument('--once', action='store_true', help="Salir cuando no queden feeds pendientes.")
+    sub.add_parser('report', help="Arma y envía el reporte con lo ingerido desde el último.")
+    args = parser.parse_args()
+
+    settings = load_settings()
+    if args.command == 'report':
+        asyncio.run(send_report(settings))
+        sys.exit(0)
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    if args.processes == 1:
+        run_worker(base_id, settings, args.once)
+    else:
+        procs = [multiprocessing.Process(target=run_worker, args=(f"{base_id}:{i}", settings, args.once))
+                 for i in range(args.processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
@@ -0,0 +1,170 @@
+from bisect import bisect_left
+
+# ============================================================
+# TIMEFRAMES DERIVADOS DE UNA ÚNICA SERIE BASE DE VELAS
+# ============================================================
+# Resampler mantiene una serie base fina (ej: 5m) y, para cada timeframe
+# registrado (1h, 4h, 1d...), sus velas agregadas. Al llegar una vela base
+# nueva sólo se actualiza la última vela agregada de cada timeframe (O(1) por
+# timeframe): open de la primera vela base del intervalo, high/low extremos,
+# close de la última y suma de volumen. Si el exchange revisa una vela base ya
+# recibida (mismo timestamp, típico de la vela en formación), se reemplaza y
+# el intervalo agregado que la contiene se recalcula desde la serie base, así
+# que los agregados nunca arrastran valores obsoletos.
+#
+# Los intervalos se alinean a UTC como los de Kraken (1h a la hora en punto,
+# 1d a medianoche); las semanas empiezan en lunes.
+
+OPEN, HIGH, LOW, CLOSE, VOLUME = 1, 2, 3, 4, 5
+WEEK_OFFSET_MS = 4 * 86400 * 1000 # 1970-01-01 fue jueves; el primer lunes es el 5
+
+
+def parse_timeframe(timeframe):
+    """ '5m' -> 300, '4h' -> 14400, '1d' -> 86400 (segundos, mismas unidades que ccxt). """
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in units or not amount.isdigit():
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+    return int(amount) * units[unit]
+
+
+def bucket_start(ts, tf_ms):
+    """ Inicio (ms) del intervalo de `tf_ms` que contiene `ts`. """
+    offset = WEEK_OFFSET_MS if tf_ms % (604800 * 1000) == 0 else 0
+    return (ts - offset) // tf_ms * tf_ms + offset
+
+
+def aggregate(candles, start):
+    """ Vela agregada de `start` a partir de sus velas base (en orden). """
+    return [start, candles[0][OPEN], max(c[HIGH] for c in candles), min(c[LOW] for c in candles),
+            candles[-1][CLOSE], sum(c[VOLUME] for c in candles)]
+
+
+class Resampler:
+    """ Serie base de velas OHLCV + agregados incrementales por timeframe. """
+
+    def __init__(self, base_timeframe, capacity=20000):
+        self.base_timeframe = base_timeframe
+        self.base_ms = parse_timeframe(base_timeframe) * 1000
+        self.capacity = capacity
+        self.base = [] # Velas base [ts, o, h, l, c, v] en orden
+        self.base_ts = [] # Timestamps de self.base (para bisect)
+        self.aggregates = {} # timeframe -> (tf_ms, velas, timestamps)
+
+    def __len__(self):
+        return len(self.base)
+
+    # --------------------------------------------------------
+    # Registro de timeframes
+    # --------------------------------------------------------
+    def add_timeframe(self, timeframe):
+        """ Registra un timeframe derivado (múltiplo del base) y lo construye desde la serie actual. """
+        if timeframe == self.base_timeframe or timeframe in self.aggregates:
+            return
+        tf_ms = parse_timeframe(timeframe) * 1000
+        if tf_ms % self.base_ms:
+            raise ValueError(f"{timeframe} no es múltiplo del timeframe base {self.base_timeframe}.")
+        candles, timestamps = [], []
+        self.aggregates[timeframe] = (tf_ms, candles, timestamps)
+        for candle in self.base:
+            self._merge(tf_ms, candles, timestamps, candle)
+
+    # --------------------------------------------------------
+    # Actualización
+    # --------------------------------------------------------
+    def push(self, candle):
+        """
+        Añade o revisa una vela base. Retorna True si cambió la serie.
+        Una vela anterior al inicio del buffer se ignora.
+        """
+        candle = [int(candle[0])] + [float(v) for v in candle[1:6]]
+        ts = candle[0]
+
+        if not self.base or ts > self.base_ts[-1]:
+            self.base.append(candle)
+            self.base_ts.append(ts)
+            for tf_ms, candles, timestamps in self.aggregates.values():
+                self._merge(tf_ms, candles, timestamps, candle)
+            self._trim()
+            return True
+
+        pos = bisect_left(self.base_ts, ts)
+        if pos < len(self.base_ts) and self.base_ts[pos] == ts:
+            if self.base[pos] == candle:
+                return False
+            self.base[pos] = candle # Revisión de una vela ya recibida
+        elif pos == 0:
+            return False # Más antigua que todo el buffer
+        else:
+            self.base.insert(pos, candle) # Hueco rellenado tarde
+            self.base_ts.insert(pos, ts)
+        for tf_ms, candles, timestamps in self.aggregates.values():
+            self._rebuild_bucket(tf_ms, candles, timestamps, bucket_start(ts, tf_ms))
+        return True
+
+    def extend(self, klines):
+        """ Incorpora una respuesta fetch_ohlcv del timeframe base. Retorna cuántas velas cambiaron. """
+        return sum(1 for candle in klines if self.push(candle))
+
+    def _merge(self, tf_ms, candles, timestamps, candle):
+        start = bucket_start(candle[0], tf_ms)
+        if not timestamps and candle[0] != start:
+            return # Intervalo inicial incompleto (la serie base empieza a mitad): se omite
+        if timestamps and timestamps[-1] == start:
+            last = candles[-1]
+            last[HIGH] = max(last[HIGH], candle[HIGH])
+            last[LOW] = min(last[LOW], candle[LOW])
+            last[CLOSE] = candle[CLOSE]
+            last[VOLUME] += candle[VOLUME]
+        else:
+            candles.append([start] + candle[1:])
+            timestamps.append(start)
+
+    def _rebuild_bucket(self, tf_ms, candles, timestamps, start):
+        lo = bisect_left(self.base_ts, start)
+        hi = bisect_left(self.base_ts, start + tf_ms)
+        pos = bisect_left(timestamps, start)
+        if pos < len(timestamps) and timestamps[pos] == start:
+            candles[pos] = aggregate(self.base[lo:hi], start)
+        elif lo < hi and (pos or self.base_ts[lo] == start):
+            candles.insert(pos, aggregate(self.base[lo:hi], start))
+            timestamps.insert(pos, start)
+
+    def _trim(self):
+        # Recorte amortizado: se descarta por bloques al superar la capacidad en un 25%.
+        excess = len(self.base) - self.capacity
+        if excess <= self.capacity // 4:
+            return
+        del self.base[:excess]
+        del self.base_ts[:excess]
+        first_ts = self.base_ts[0]
+        for tf_ms, candles, timestamps in self.aggregates.values():
+            # El primer intervalo puede quedar incompleto: se descarta entero.
+            start = bucket_start(first_ts, tf_ms)
+            cut = bisect_left(timestamps, start if start == first_ts else start + tf_ms)
+            del candles[:cut]
+            del timestamps[:cut]
+
+    # --------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------
+    def candles(self, timeframe, limit=None, now_ms=None):
+        """
+        Velas de `timeframe` con el formato de fetch_ohlcv (copias). Con `now_ms`
+        sólo se devuelven las velas cerradas a ese instante.
+        """
+        if timeframe == self.base_timeframe:
+            tf_ms, candles = self.base_ms, self.base
+        else:
+            self.add_timeframe(timeframe)
+            tf_ms, candles, _ = self.aggregates[timeframe]
+        if now_ms is not None:
+            end = len(candles)
+            while end and candles[end - 1][0] + tf_ms > now_ms:
+                end -= 1
+            candles = candles[:end]
+        selected = candles[-limit:] if limit else candles
+        return [list(c) for c in selected]
+
+    def last_timestamp(self):
+        return self.base_ts[-1] if self.base_ts else None
@@ -0,0 +1,134 @@
+import re
+import html
+from collections import namedtuple
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+# ==============================================================================
+# PARSER RSS/ATOM EN STREAMING (SÓLO LOS CAMPOS QUE USA EL BOT)
+# ==============================================================================
+# feedparser construye un árbol normalizado completo, sanea el HTML de cada
+# campo y parsea fechas de todas las entradas, aunque sólo leemos title y link.
+# Este parser alimenta expat de forma incremental (XMLPullParser), extrae
+# title/link/guid/fecha de cada <item> (RSS 2.0/1.0) o <entry> (Atom), libera
+# cada elemento al cerrarlo y puede detenerse tras `max_entries` sin parsear el
+# resto del documento. Ante XML mal formado o un formato no reconocido se usa
+# feedparser como respaldo, con las mismas entradas (atributos title/link).
+
+FeedEntry = namedtuple("FeedEntry", "title link guid published")
+
+CHUNK_SIZE = 16 * 1024
+ENTRY_TAGS = {"item", "entry"}
+FEED_ROOTS = {"rss", "feed", "RDF"}
+TAG_RE = re.compile(r"<[^>]+>")
+# Espacios de nombres de los campos de la entrada: sin namespace (RSS 2.0), Atom
+# y RSS 1.0. Dublin Core sólo aporta dc:date; media:title, itunes:title, etc. se ignoran.
+FIELD_NAMESPACES = {"", "http://www.w3.org/2005/Atom", "http://purl.org/rss/1.0/"}
+DC_NAMESPACE = "http://purl.org/dc/elements/1.1/"
+
+
+def _local(tag: str) -> str:
+    """ '{http://www.w3.org/2005/Atom}entry' -> 'entry'. """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _namespace(tag: str) -> str:
+    """ '{http://www.w3.org/2005/Atom}entry' -> 'http://www.w3.org/2005/Atom'. """
+    return tag[1:].split("}", 1)[0] if tag.startswith("{") else ""
+
+
+def _clean_text(text: str) -> str:
+    text = html.unescape(text)
+    if "<" in text:
+        text = html.unescape(TAG_RE.sub("", text))
+    return " ".join(text.split())
+
+
+def parse_fast(content: bytes, max_entries: int = None) -> list:
+    """
+    Extrae las entradas con el parser en streaming. Lanza ParseError/ValueError
+    si el documento está mal formado o no es RSS/Atom.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    entries = []
+    depth = 0
+    entry_depth = None
+    root = None
+    fields = {}
+
+    for offset in range(0, len(content), CHUNK_SIZE):
+        parser.feed(content[offset:offset + CHUNK_SIZE])
+        for event, elem in parser.read_events():
+            name = _local(elem.tag)
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = name
+                    if root not in FEED_ROOTS:
+                        raise ValueError(f"Raíz no reconocida: {root}")
+                elif entry_depth is None and name in ENTRY_TAGS:
+                    entry_depth = depth
+                    fields = {}
+                continue
+
+            # event == "end"
+            if entry_depth is not None and depth == entry_depth + 1:
+                # Hijo directo de la entrada: sólo los campos que interesan.
+                namespace = _namespace(elem.tag)
+                if namespace not in FIELD_NAMESPACES:
+                    if namespace == DC_NAMESPACE and name == "date":
+                        fields.setdefault("published", (elem.text or "").strip())
+                elif name == "title" and "title" not in fields:
+                    fields["title"] = _clean_text("".join(elem.itertext()))
+                elif name == "link" and "link" not in fields:
+                    rel = elem.get("rel", "alternate")
+                    href = elem.get("href")
+                    if href and rel == "alternate":
+                        fields["link"] = href.strip()
+                    elif elem.text and elem.text.strip():
+                        fields["link"] = elem.text.strip()
+                elif name in ("guid", "id"):
+                    fields.setdefault("guid", (elem.text or "").strip())
+                elif name in ("pubDate", "published", "updated"):
+                    fields.setdefault("published", (elem.text or "").strip())
+            elif depth == entry_depth:
+                if fields.get("title"):
+                    entries.append(FeedEntry(fields["title"], fields.get("link", ""),
+                                             fields.get("guid") or fields.get("link", ""),
+                                             fields.get("published", "")))
+                    if max_entries and len(entries) >= max_entries:
+                        return entries # Parada temprana: no se lee el resto
+                entry_depth = None
+                elem.clear()
+            depth -= 1
+
+    parser.close()
+    if root is None:
+        raise ValueError("Documento vacío")
+    return entries
+
+
+def parse_feedparser(content: bytes, max_entries: int = None) -> list:
+    """ Respaldo completo con feedparser, devuelto con el mismo formato. """
+    import feedparser
+
+    feed = feedparser.parse(content)
+    entries = []
+    for entry in feed.entries[:max_entries] if max_entries else feed.entries:
+        if not entry.get("title"):
+            continue
+        entries.append(FeedEntry(entry.title, entry.get("link", ""),
+                                 entry.get("id", entry.get("link", "")),
+                                 entry.get("published", entry.get("updated", ""))))
+    return entries
+
+
+def parse_feed(content: bytes, max_entries: int = None) -> list:
+    """
+    Entradas del feed (title/link/guid/published). Usa el parser en streaming y
+    recurre a feedparser si el XML está mal formado o el formato es exótico.
+    """
+    try:
+        return parse_fast(content, max_entries)
+    except (ParseError, ValueError) as e:
+        print(f"DEBUG RSS: Parser rápido falló ({e}); usando feedparser.")
+        return parse_feedparser(content, max_entries)
@@ -0,0 +1,210 @@
+import os
+import json
+import glob
+import fcntl
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# ALMACÉN DE ESTADO: SNAPSHOT ATÓMICO + JOURNAL APPEND-ONLY
+# ============================================================
+# Estructura en disco (para STATE_FILE = bot_state.json):
+#   bot_state.json            -> snapshot completo (escritura tmp + rename), con "_seq"
+#   bot_state.json.journal    -> una línea JSON por commit: sólo los campos cambiados
+#   bot_state.json.journal.N  -> journals rotados (N = primer seq), historial de auditoría
+#
+# Cada commit añade una línea con el diff (coste proporcional a lo que cambió, no
+# al tamaño del estado) y cada SNAPSHOT_EVERY commits se reescribe el snapshot y
+# se rota el journal. Una línea truncada por un crash al final del journal se
+# ignora: el estado vuelve al último commit completo.
+
+SNAPSHOT_EVERY = 50
+SEQ_KEY = "_seq"
+
+
+class StateStore:
+    """ Estado persistente con snapshot atómico y journal de transiciones. """
+
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.snapshot_every = snapshot_every
+
+    # --------------------------------------------------------
+    # Lectura
+    # --------------------------------------------------------
+    def _read_snapshot(self):
+        """ Retorna (estado, seq) del snapshot; ({}, 0) si no existe. """
+        if not os.path.exists(self.path):
+            return {}, 0
+        with open(self.path, "r") as f:
+            state = json.load(f)
+        seq = int(state.pop(SEQ_KEY, 0))
+        return state, seq
+
+    @staticmethod
+    def _read_journal(path):
+        """ Entradas válidas de un journal (descarta una última línea truncada). """
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Entrada de journal incompleta en {path}; se ignora.")
+                    break
+        return entries
+
+    def _journal_files(self):
+        """ Journals rotados en orden de seq, seguidos del journal activo. """
+        rotated = glob.glob(f"{self.journal_path}.*")
+        rotated = [p for p in rotated if p.rsplit(".", 1)[-1].isdigit()]
+        rotated.sort(key=lambda p: int(p.rsplit(".", 1)[-1]))
+        return rotated + [self.journal_path]
+
+    def _rotated_seq(self):
+        """ Último seq registrado en los journals rotados (0 si no hay). """
+        for path in reversed(self._journal_files()[:-1]):
+            entries = self._read_journal(path)
+            if entries:
+                return entries[-1]["seq"]
+        return 0
+
+    @staticmethod
+    def _apply(state, entry):
+        state.update(entry.get("set", {}))
+        for key in entry.get("unset", []):
+            state.pop(key, None)
+        return state
+
+    def _load(self):
+        """ Retorna (estado, seq, seq_del_snapshot). """
+        try:
+            state, snapshot_seq = self._read_snapshot()
+        except Exception as e:
+            logger.critical(f"Snapshot de estado ilegible ({e}). Reconstruyendo desde el journal.")
+            state, seq = self.replay()
+            # Lo ya rotado cuenta como cubierto: la próxima rotación no debe pisarlo.
+            return state, seq, self._rotated_seq()
+
+        seq = snapshot_seq
+        for entry in self._read_journal(self.journal_path):
+            if entry["seq"] > seq:
+                self._apply(state, entry)
+                seq = entry["seq"]
+        return state, seq, snapshot_seq
+
+    def load(self):
+        """
+        Retorna (estado, seq): snapshot + entradas del journal posteriores a él.
+        Si el snapshot está dañado, reconstruye el estado desde el historial.
+        """
+        state, seq, _ = self._load()
+        return state, seq
+
+    def history(self):
+        """ Itera todas las transiciones registradas (auditoría), en orden. """
+        for path in self._journal_files():
+            for entry in self._read_journal(path):
+                yield entry
+
+    def replay(self, until_seq=None):
+        """ Reconstruye el estado aplicando el historial hasta until_seq (incluido). """
+        state, seq = {}, 0
+        for entry in self.history():
+            if until_seq is not None and entry["seq"] > until_seq:
+                break
+            self._apply(state, entry)
+            seq = entry["seq"]
+        return state, seq
+
+    # --------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------
+    @staticmethod
+    def _diff(old, new):
+        changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+        removed = [k for k in old if k not in new]
+        return changed, removed
+
+    def _write_snapshot(self, state, seq):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({**state, SEQ_KEY: seq}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _rotate(self, first_seq):
+        """ Renombra el journal activo a .journal.<first_seq> sin pisar nunca uno rotado. """
+        rotated_path = f"{self.journal_path}.{first_seq}"
+        if os.path.exists(rotated_path):
+            logger.critical(f"{rotated_path} ya existe; no se rota el journal para no perder historial.")
+            return False
+        os.replace(self.journal_path, rotated_path)
+        return True
+
+    def commit(self, state, reasons=()):
+        """
+        Persiste `state` como una única transición. Retorna el seq resultante
+        (sin escribir nada si no hubo cambios respecto al estado en disco).
+        """
+        state = {k: v for k, v in state.items() if k != SEQ_KEY}
+        with open(self.journal_path, "a+") as journal:
+            fcntl.flock(journal, fcntl.LOCK_EX)
+            try:
+                # Una línea truncada por un crash previo se recorta antes de añadir.
+                journal.seek(0)
+                content = journal.read()
+                if content and not content.endswith("\n"):
+                    journal.truncate(content.rfind("\n") + 1)
+
+                current, seq, snapshot_seq = self._load()
+                changed, removed = self._diff(current, state)
+                if not changed and not removed:
+                    return seq
+                if seq == 0:
+                    # Primera transición: se registra el estado completo como base del historial.
+                    changed, removed = dict(state), []
+
+                seq += 1
+                entry = {
+                    "seq": seq,
+                    "ts": datetime.utcnow().isoformat(),
+                    "reasons": list(reasons),
+                    "set": changed,
+                    "unset": removed,
+                }
+                journal.write(json.dumps(entry) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+
+                if seq - snapshot_seq >= self.snapshot_every:
+                    self._write_snapshot(state, seq)
+                    # El journal ya está cubierto por el snapshot: se rota para auditoría.
+                    self._rotate(snapshot_seq + 1)
+                return seq
+            finally:
+                fcntl.flock(journal, fcntl.LOCK_UN)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Auditoría del journal de estado del bot.")
+    parser.add_argument("state_file", nargs="?", default=os.getenv("STATE_FILE", "bot_state.json"))
+    parser.add_argument("--at", type=int, help="Reconstruye el estado en este seq.")
+    args = parser.parse_args()
+
+    store = StateStore(args.state_file)
+    if args.at is not None:
+        state, seq = store.replay(args.at)
+        print(json.dumps({"seq": seq, "state": state}, indent=2))
+    else:
+        for entry in store.history():
+            print(f"#{entry['seq']} {entry['ts']} {', '.join(entry['reasons']) or '-'}: "
+                  f"set={json.dumps(entry['set'])} unset={entry['unset']}")
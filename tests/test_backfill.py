@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("ccxt")
+
+from backfill import Backfill
+
+H = 3600 * 1000
+NOW = int(time.time() * 1000) // H * H
+
+
+def _candles(start, end):
+    return [[t, 1.0, 2.0, 0.5, 1.5, 10.0] for t in range(start, end, H)]
+
+
+class PagedExchange:
+    """ Pagina desde `since` como binance; `empty_once` devuelve una página vacía una vez. """
+    id = "paged"
+    rateLimit = 1
+    empty_once = set()
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        if since in self.empty_once:
+            self.empty_once.discard(since)
+            return []
+        return _candles(since, min(since + limit * H, NOW + H))
+
+
+class LatestOnlyExchange:
+    """ Como Kraken: ignora `since` y devuelve siempre las últimas 720 velas. """
+    id = "latest"
+    rateLimit = 1
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        return _candles(NOW - 719 * H, NOW + H)
+
+
+def _backfill(factory, tmp_path):
+    return Backfill(factory, "ADA/USD", "1h", out_dir=str(tmp_path), workers=2,
+                    chunk_candles=1000, page_limit=300, rate_limit_seconds=0)
+
+
+def test_rerun_fetches_open_and_transiently_empty_chunks(tmp_path):
+    start = NOW - 3000 * H
+    PagedExchange.empty_once = {start + 1300 * H}
+
+    manifest = _backfill(PagedExchange, tmp_path).run(start, NOW - 500 * H)
+    assert len(manifest["incomplete_chunks"]) == 2 # El del hueco transitorio y el último (abierto)
+
+    manifest = _backfill(PagedExchange, tmp_path).run(start, NOW)
+    assert manifest["rows"] == 3000 and manifest["missing_candles"] == 0
+    assert manifest["stats"]["chunks_skipped"] == 1
+
+    manifest = _backfill(PagedExchange, tmp_path).run(start, NOW)
+    assert manifest["stats"]["chunks_downloaded"] == 0
+
+
+def test_range_not_served_is_never_marked_done(tmp_path):
+    bf = _backfill(LatestOnlyExchange, tmp_path)
+    manifest = bf.run(NOW - 3000 * H, NOW)
+
+    assert len(manifest["unserved_chunks"]) == 3
+    assert not [n for n in os.listdir(bf.parts_dir) if n.endswith(".done")]
+    assert _backfill(LatestOnlyExchange, tmp_path).run(NOW - 3000 * H, NOW)["stats"]["chunks_skipped"] == 0
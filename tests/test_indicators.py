@@ -0,0 +1,103 @@
+import random
+import statistics
+
+import pytest
+
+from indicators import ATR, EMA, MACD, RSI, BollingerBands, IndicatorEngine
+
+H = 3600 * 1000
+
+
+def _klines(n, seed=7):
+    rng = random.Random(seed)
+    price, klines = 100.0, []
+    for i in range(n):
+        open_ = price
+        price *= 1 + rng.gauss(0, 0.01)
+        high = max(open_, price) * (1 + rng.random() * 0.005)
+        low = min(open_, price) * (1 - rng.random() * 0.005)
+        klines.append([i * H, open_, high, low, price, rng.random() * 100])
+    return klines
+
+
+def _engine(capacity=500):
+    engine = IndicatorEngine(capacity=capacity)
+    for indicator in (EMA(20), MACD(12, 26, 9), RSI(14), ATR(14), BollingerBands(20, 2.0)):
+        engine.register(indicator)
+    return engine
+
+
+def _assert_same(values, expected):
+    assert values.keys() == expected.keys()
+    for key, value in expected.items():
+        if value is None:
+            assert values[key] is None, key
+        else:
+            assert values[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+
+
+def test_small_ring_matches_full_history_after_wraparound():
+    small, full = _engine(capacity=60), _engine(capacity=500)
+    for candle in _klines(200):
+        small.push(candle)
+        full.push(candle)
+        _assert_same(small.values(), full.values())
+    assert len(small) == 60
+    assert small.ring.to_klines() == full.ring.to_klines()[-60:]
+
+
+def test_revised_last_candle_matches_series_with_final_values():
+    klines = _klines(80)
+    revised = list(klines[-1])
+    revised[2] *= 1.02
+    revised[4] *= 1.01
+
+    engine = _engine()
+    engine.extend(klines)
+    assert engine.push(revised)
+    assert not engine.push(revised) # Misma vela: sin cambios
+    assert not engine.push(klines[10]) # Más antigua que la última: se ignora
+
+    expected = _engine()
+    expected.extend(klines[:-1] + [revised])
+    _assert_same(engine.values(), expected.values())
+
+
+def test_bollinger_matches_sample_standard_deviation():
+    klines = _klines(50)
+    engine = _engine()
+    engine.extend(klines)
+    closes = [k[4] for k in klines[-20:]]
+    mean, deviation = statistics.mean(closes), statistics.stdev(closes)
+
+    values = engine.values()
+    assert values["BBM_20_2.0"] == pytest.approx(mean)
+    assert values["BBU_20_2.0"] == pytest.approx(mean + 2 * deviation)
+    assert values["BBL_20_2.0"] == pytest.approx(mean - 2 * deviation)
+
+
+def test_engine_matches_pandas_ta_on_every_candle():
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pandas_ta")
+    klines = _klines(300)
+    df = pd.DataFrame(klines, columns=["Timestamp", "Open", "High", "Low", "Close", "Volume"])
+    df.ta.ema(close="Close", length=20, append=True)
+    df.ta.macd(close="Close", fast=12, slow=26, signal=9, append=True)
+    df.ta.rsi(close="Close", length=14, append=True)
+    df.ta.atr(high="High", low="Low", close="Close", length=14, append=True)
+    df.ta.bbands(close="Close", length=20, std=2.0, append=True)
+    # pandas_ta 0.4 añade las desviaciones inferior/superior al nombre: BBL_20_2.0_2.0.
+    columns = {name: next(c for c in df.columns if c.startswith(name))
+               for name in ("EMA_20", "MACD_12_26_9", "MACDh_12_26_9", "MACDs_12_26_9", "RSI_14",
+                            "ATRr_14", "BBL_20_2.0", "BBM_20_2.0", "BBU_20_2.0")}
+
+    engine = _engine()
+    for i, candle in enumerate(klines):
+        engine.push(candle)
+        values = engine.values()
+        for name, column in columns.items():
+            expected = df[column].iloc[i]
+            if pd.isna(expected):
+                assert values[name] is None, (i, name)
+            else:
+                assert values[name] == pytest.approx(expected, rel=1e-9, abs=1e-9), (i, name)
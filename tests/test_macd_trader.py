@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("pandas_ta")
+ccxt = pytest.importorskip("ccxt")
+
+import macd_trader as mt
+from state_store import StateStore
+
+# Respuesta mínima de AssetPairs: el id (XXBTZUSD) difiere del altname (XBTUSD).
+ASSET_PAIRS = {"error": [], "result": {"XXBTZUSD": {
+    "altname": "XBTUSD", "wsname": "XBT/USD", "aclass_base": "currency", "base": "XXBT",
+    "aclass_quote": "currency", "quote": "ZUSD", "lot": "unit", "pair_decimals": 1, "lot_decimals": 8,
+    "lot_multiplier": 1, "cost_decimals": 5, "leverage_buy": [], "leverage_sell": [], "fees": [[0, 0.26]],
+    "fees_maker": [[0, 0.16]], "fee_volume_currency": "ZUSD", "margin_call": 80, "margin_stop": 40,
+    "ordermin": "0.0001", "costmin": "0.5", "tick_size": "0.1", "status": "online"}}}
+
+
+def _kraken():
+    ex = ccxt.kraken()
+    ex.publicGetAssetPairs = lambda params={}: ASSET_PAIRS
+    ex.fetch_currencies = lambda params={}: {}
+    return ex
+
+
+def test_markets_cache_restores_altname_lookup(tmp_path, monkeypatch):
+    monkeypatch.setattr(mt, "MARKETS_CACHE_FILE", str(tmp_path / "markets.json"))
+    online = _kraken()
+    online.load_markets()
+    mt.save_markets_cache(online)
+
+    cached = ccxt.kraken()
+    assert mt.load_markets_cache(cached)
+
+    assert cached.find_market_by_altname_or_id("XBTUSD")["symbol"] == "BTC/USD"
+    order = cached.parse_order({"descr": {"pair": "XBTUSD", "type": "buy", "ordertype": "market"},
+                                "status": "closed", "vol": "0.01", "vol_exec": "0.01"})
+    assert order["symbol"] == "BTC/USD"
+
+
+def test_markets_cache_without_helper_options_is_refreshed(tmp_path, monkeypatch):
+    path = tmp_path / "markets.json"
+    monkeypatch.setattr(mt, "MARKETS_CACHE_FILE", str(path))
+    online = _kraken()
+    online.load_markets()
+    mt.save_markets_cache(online)
+    cache = json.loads(path.read_text())
+    del cache["options"] # Formato anterior: sólo markets/currencies
+    path.write_text(json.dumps(cache))
+
+    assert not mt.load_markets_cache(ccxt.kraken())
+
+
+class PriceFeed:
+    """ Servidor local con el formato Ticker de Kraken (result -> par -> c[0]). """
+
+    def __init__(self, price):
+        self.price = price
+        feed = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps({"error": [], "result": {"ADAUSD": {"c": [str(feed.price), "1"]}}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/0/public/Ticker?pair=ADAUSD"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_stop_watcher_trails_and_closes_against_local_price_feed(tmp_path, monkeypatch):
+    feed = PriceFeed(100.0)
+    state_file = str(tmp_path / "state.json")
+    alerts = []
+    monkeypatch.setattr(mt, "PRICE_FEED_URL", feed.url)
+    monkeypatch.setattr(mt, "STATE_FILE", state_file)
+    monkeypatch.setattr(mt, "PAPER_TRADING_MODE", True)
+    monkeypatch.setattr(mt, "TRAILING_PERCENT", 0.01)
+    monkeypatch.setattr(mt, "MIN_PROFIT_TRIGGER", 0.005)
+    monkeypatch.setattr(mt, "WATCH_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(mt, "send_telegram_alert", lambda msg, **kwargs: alerts.append(msg))
+    monkeypatch.setattr(mt, "_state_store", None)
+    monkeypatch.setattr(mt, "_price_session", None)
+    StateStore(state_file).commit({**mt.DEFAULT_STATE, "initial_balance": 1000.0, "position_open": True,
+                                   "entry_price": 100.0, "position_qty": 10.0}, reasons=["entrada"])
+
+    stop = threading.Event()
+    watcher = threading.Thread(target=mt.run_stop_watcher, args=(stop,), daemon=True)
+    watcher.start()
+    try:
+        feed.price = 110.0
+        assert _wait_for(lambda: mt.load_state()["last_stop_price"] == pytest.approx(108.9))
+        feed.price = 108.0 # Perfora el stop (108.9)
+        assert _wait_for(lambda: not mt.load_state()["position_open"])
+    finally:
+        stop.set()
+        watcher.join(5)
+        feed.close()
+
+    state, _ = StateStore(state_file).load()
+    assert state["position_open"] is False and state["last_stop_price"] == 0.0
+    reasons = [reason for entry in StateStore(state_file).history() for reason in entry["reasons"]]
+    assert reasons.count("watcher intrabar") == 2
+    assert any("SELL" in msg and "INTRABAR" in msg for msg in alerts)
+
+
+def test_ring_engine_matches_calculate_macd(monkeypatch):
+    monkeypatch.setattr(mt, "_indicator_engine", None)
+    monkeypatch.setattr(mt, "WARMUP_FILE", None)
+    price, klines = 1.0, []
+    for i in range(120):
+        price *= 1.01 if i % 7 < 4 else 0.985
+        klines.append([i * 3600 * 1000, price, price * 1.01, price * 0.99, price, 100.0])
+
+    df = mt.calculate_macd(klines)
+    for i in range(60, len(klines) + 1, 20):
+        engine = mt.calculate_indicators(klines[:i])
+        ring, pandas = mt.latest_values(engine), mt.calculate_macd(klines[:i]).iloc[-1]
+        for column in ("MACD_12_26_9", "MACDh_12_26_9", "MACDs_12_26_9"):
+            assert ring[column] == pytest.approx(pandas[column], rel=1e-9, abs=1e-12), (i, column)
+    assert mt.generate_signal(engine) == mt.generate_signal(df)
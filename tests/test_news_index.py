@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from news_index import NewsIndex
+from news_scoring import score_headline
+
+
+class Doc(dict):
+    def __init__(self, doc_id, **fields):
+        super().__init__(fields)
+        self.doc_id = doc_id
+
+
+def _record(headline, **extra):
+    return {"timestamp": datetime(2024, 5, 1, 10).isoformat(), "headline": headline, **extra}
+
+
+def test_phrase_matches_on_token_boundaries():
+    index = NewsIndex()
+    index.add(1, _record("Central: el banco centraliza pagos"))
+    index.add(2, _record("El Banco Central sube tipos"))
+
+    result = index.search("banco central")
+
+    assert [r["doc_id"] for r in result["results"]] == [2]
+
+
+def test_sync_scores_records_without_score(tmp_path):
+    headline = "Récord de inversión tras la subida del mercado"
+    expected, _ = score_headline(headline.lower())
+    assert expected != 0
+    index = NewsIndex(str(tmp_path / "index.json"))
+
+    index.sync([Doc(1, **_record(headline, category="ECONOMIA")), Doc(2, **_record("Sin cambios", score=5))])
+
+    assert {r["doc_id"]: r["score"] for r in index.search()["results"]} == {1: expected, 2: 5}
+    index.save()
+    assert NewsIndex.load(index.path).search()["sentiment"]["total"] == expected + 5
@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("toml")
+
+import news_workers
+
+
+def test_feeds_removed_from_config_are_no_longer_claimed(tmp_path):
+    conn = news_workers.connect(str(tmp_path / "news.db"))
+    news_workers.register_feeds(conn, ["http://a", "http://b"])
+
+    assert news_workers.register_feeds(conn, ["http://b", "http://c"]) == 1
+
+    claimed = {news_workers.claim_feed(conn, "w1", 60) for _ in range(3)}
+    assert claimed == {"http://b", "http://c", None}
+    conn.close()
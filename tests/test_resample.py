@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from resample import Resampler, bucket_start
+
+M5 = 5 * 60 * 1000
+H = 12 * M5
+DAY = 24 * H
+MONDAY = 4 * DAY # 1970-01-05
+
+
+def _base(n, start, seed=3):
+    rng = random.Random(seed)
+    price, klines = 100.0, []
+    for i in range(n):
+        open_ = price
+        price *= 1 + rng.gauss(0, 0.002)
+        klines.append([start + i * M5, open_, max(open_, price) + rng.random(),
+                       min(open_, price) - rng.random(), price, rng.random() * 10])
+    return klines
+
+
+def _aggregate(base, tf_ms):
+    """ Agregado de referencia: agrupa por intervalo y omite el inicial incompleto. """
+    buckets = {}
+    for candle in base:
+        buckets.setdefault(bucket_start(candle[0], tf_ms), []).append(candle)
+    out = []
+    for start, group in sorted(buckets.items()):
+        if not out and group[0][0] != start:
+            continue
+        out.append([start, group[0][1], max(c[2] for c in group), min(c[3] for c in group),
+                    group[-1][4], sum(c[5] for c in group)])
+    return out
+
+
+def _assert_candles(actual, expected):
+    assert [c[0] for c in actual] == [c[0] for c in expected]
+    for a, e in zip(actual, expected):
+        assert a == pytest.approx(e)
+
+
+def test_aggregates_match_reference_and_align_to_utc():
+    # Empieza a mitad de hora y en miércoles: el primer intervalo de cada timeframe es incompleto.
+    base = _base(5000, MONDAY + 2 * DAY + 7 * M5)
+    resampler = Resampler("5m", capacity=10000)
+    resampler.add_timeframe("1h")
+    resampler.extend(base[:2000])
+    resampler.add_timeframe("4h") # Registrado tarde: se construye desde la serie actual
+    resampler.extend(base[2000:])
+
+    for timeframe, tf_ms in (("1h", H), ("4h", 4 * H), ("1d", DAY), ("1w", 7 * DAY)):
+        _assert_candles(resampler.candles(timeframe), _aggregate(base, tf_ms))
+    assert all((c[0] - MONDAY) % (7 * DAY) == 0 for c in resampler.candles("1w"))
+
+
+def test_revisions_and_late_gaps_rebuild_the_bucket():
+    base = _base(600, 10 * DAY)
+    resampler = Resampler("5m")
+    resampler.add_timeframe("1h")
+    missing = base.pop(300) # Hueco que llega tarde
+    resampler.extend(base)
+
+    revised = list(base[-1]) # Vela en formación revisada por el exchange
+    revised[2] += 5.0
+    revised[4] += 1.0
+    base[-1] = revised
+    assert resampler.push(revised)
+    assert not resampler.push(revised)
+    assert resampler.push(missing)
+    base.insert(300, missing)
+
+    _assert_candles(resampler.candles("1h"), _aggregate(base, H))
+    assert resampler.candles("5m") == [list(map(float, c)) for c in base]
+
+
+def test_trim_keeps_capacity_and_drops_partial_first_bucket():
+    base = _base(3000, 10 * DAY + 5 * M5)
+    resampler = Resampler("5m", capacity=1000)
+    resampler.add_timeframe("1h")
+    resampler.add_timeframe("4h")
+    for candle in base:
+        resampler.push(candle)
+        assert len(resampler) <= 1250
+
+    kept = base[-len(resampler):]
+    for timeframe, tf_ms in (("1h", H), ("4h", 4 * H)):
+        candles = resampler.candles(timeframe)
+        _assert_candles(candles, _aggregate(kept, tf_ms))
+        assert candles[0][0] >= kept[0][0]
+
+
+def test_closed_only_drops_the_open_bucket_and_rejects_non_multiples():
+    base = _base(30, 10 * DAY)
+    resampler = Resampler("5m")
+    resampler.extend(base)
+    now_ms = base[-1][0] + M5 # La última vela de 5m acaba de cerrar; la hora 2 sigue abierta
+
+    assert [c[0] for c in resampler.candles("1h", now_ms=now_ms)] == [10 * DAY, 10 * DAY + H]
+    assert len(resampler.candles("1h")) == 3
+    assert resampler.candles("5m", limit=2, now_ms=now_ms) == [list(map(float, c)) for c in base[-2:]]
+    with pytest.raises(ValueError):
+        resampler.add_timeframe("7m")
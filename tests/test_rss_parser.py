@@ -0,0 +1,42 @@
+from rss_parser import parse_fast
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/"
+     xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel><title>Canal</title>
+    <item>
+      <media:title>Foto del dia</media:title>
+      <itunes:title>Episodio</itunes:title>
+      <dc:title>Titulo DC</dc:title>
+      <title>Real headline</title>
+      <media:link>http://media/x</media:link>
+      <link>http://noticia/1</link>
+      <dc:date>2024-05-01T10:00:00Z</dc:date>
+    </item>
+  </channel>
+</rss>"""
+
+ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/">
+  <entry>
+    <media:title>Miniatura</media:title>
+    <title>Atom headline</title>
+    <link rel="alternate" href="http://noticia/2"/>
+    <id>urn:2</id>
+    <updated>2024-05-02T10:00:00Z</updated>
+  </entry>
+</feed>"""
+
+
+def test_namespaced_fields_do_not_replace_the_headline():
+    (entry,) = parse_fast(RSS)
+    assert entry.title == "Real headline"
+    assert entry.link == "http://noticia/1"
+    assert entry.guid == "http://noticia/1"
+    assert entry.published == "2024-05-01T10:00:00Z"
+
+
+def test_atom_entry_ignores_media_title():
+    (entry,) = parse_fast(ATOM)
+    assert (entry.title, entry.link, entry.guid, entry.published) == \
+        ("Atom headline", "http://noticia/2", "urn:2", "2024-05-02T10:00:00Z")
@@ -0,0 +1,38 @@
+import os
+
+from state_store import StateStore
+
+
+def _commit_n(store, start, n):
+    for i in range(start, start + n):
+        store.commit({"counter": i}, reasons=[f"commit {i}"])
+
+
+def test_commit_after_corrupt_snapshot_keeps_rotated_history(tmp_path):
+    path = str(tmp_path / "s.json")
+    store = StateStore(path, snapshot_every=3)
+    _commit_n(store, 1, 5)
+    assert [e["seq"] for e in store.history()] == [1, 2, 3, 4, 5]
+
+    with open(path, "w") as f:
+        f.write("{corrupto")
+
+    assert store.load() == ({"counter": 5}, 5)
+    _commit_n(store, 6, 1)
+
+    assert [e["seq"] for e in store.history()] == [1, 2, 3, 4, 5, 6]
+    assert store.replay(2) == ({"counter": 2}, 2)
+    assert store.load() == ({"counter": 6}, 6)
+
+
+def test_rotation_never_overwrites_existing_journal(tmp_path):
+    path = str(tmp_path / "s.json")
+    store = StateStore(path, snapshot_every=3)
+    _commit_n(store, 1, 2)
+    with open(f"{path}.journal.1", "w") as f:
+        f.write("")
+
+    _commit_n(store, 3, 1)
+
+    assert os.path.exists(store.journal_path)
+    assert store.load() == ({"counter": 3}, 3)